@@ -2,15 +2,14 @@ import json
 import re
 
 import cloudscraper
-
-scraper = cloudscraper.create_scraper()
 import pandas as pd
-from aiolimiter import AsyncLimiter
 from fake_useragent import UserAgent
 
 import ml_scheduler
 
-limiter = AsyncLimiter(2, time_period=1)
+# 2 requests per second, shared scrapers instead of one per row
+limiter = ml_scheduler.pools.RatePool(2, period=1)
+scrapers = ml_scheduler.pools.ConnectionPool(cloudscraper.create_scraper, size=4)
 ins_id_regex = re.compile(r'"instrumentId":"(\d+)"')
 data_base_url = "https://api.investing.com/api/financialdata/historical/{ins_id}?start-date=2000-01-01&end-date=2024-06-28&time-frame=Monthly&add-missing-rows=false"
 ua = UserAgent()
@@ -18,16 +17,14 @@ ua = UserAgent()
 headers = {}
 
 
-@ml_scheduler.exp_func
+@ml_scheduler.exp_func(retry=3)
 async def crawl(exp: ml_scheduler.Exp, url, ins_id=None):
 
+    scraper = (await exp.get(scrapers.allocate, 1))[0].client
+
     if ins_id is None or str(ins_id) == 'nan':
-        async with limiter:
-            text = scraper.get(url,
-                               headers={
-                                   'User-Agent': ua.chrome,
-                                   **headers
-                               }).text
+        await exp.get(limiter.allocate, 1)
+        text = (await exp.to_thread(scraper.get, url, headers={'User-Agent': ua.chrome, **headers})).text
 
         ins_id = ins_id_regex.search(text).group(1)
         await exp.report(ins_id=ins_id)
@@ -36,17 +33,18 @@ async def crawl(exp: ml_scheduler.Exp, url, ins_id=None):
     data_url = data_base_url.format(ins_id=ins_id)
     print(data_url)
 
-    async with limiter:
-        text = scraper.get(data_base_url.format(ins_id=ins_id),
-                           headers={
-                               'User-Agent': ua.chrome,
-                               **headers
-                           }).text
-        try:
-            data = json.loads(text)['data']
-        except json.JSONDecodeError as e:
-            print(text)
-            raise e
+    await exp.get(limiter.allocate, 1)
+    response = await exp.to_thread(scraper.get, data_url, headers={'User-Agent': ua.chrome, **headers})
+    if response.status_code == 429:
+        # slow down and let the retry policy run this row again
+        limiter.throttled(retry_after=float(response.headers.get('Retry-After', 10)))
+        response.raise_for_status()
+    text = response.text
+    try:
+        data = json.loads(text)['data']
+    except json.JSONDecodeError as e:
+        print(text)
+        raise e
 
     print(data)
     df = pd.DataFrame(data)
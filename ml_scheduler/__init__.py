@@ -3,12 +3,21 @@
 A lightweight machine learning experiments scheduler in a few lines of simple Python
 """
 __version__ = "1.2.0"
-import coloredlogs
-
-coloredlogs.install()
-
 from . import pools
-from .exp import Exp, exp_func
-from .threads import to_thread
+from .adaptive import AIMDController
+from .exp import Exp, GangScheduler, Preempted, PreemptionPolicy, RetryPolicy, exp_func
+from .threads import StallDetector, set_executor_sizes, to_thread
 
-__all__ = "pools", "Exp", "exp_func", "to_thread"
+__all__ = (
+    "pools",
+    "AIMDController",
+    "Exp",
+    "GangScheduler",
+    "Preempted",
+    "PreemptionPolicy",
+    "RetryPolicy",
+    "StallDetector",
+    "exp_func",
+    "set_executor_sizes",
+    "to_thread",
+)
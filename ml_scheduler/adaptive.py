@@ -0,0 +1,178 @@
+"""Adaptive concurrency control of pool limits from observed throughput"""
+
+import time
+from collections import deque
+from logging import getLogger
+from typing import Any, Callable, Deque, NamedTuple, Optional
+
+logger = getLogger(__name__)
+
+
+class Decision(NamedTuple):
+    time: float
+    old: float
+    new: float
+    reason: str
+    throughput: float
+    error_rate: float
+    latency: Optional[float]
+
+
+class AIMDController:
+    """Tune a pool limit at runtime like TCP congestion control.
+
+    Every `interval` seconds, the samples fed by `record` are summarized into a throughput, an
+    error rate and an average latency. The limit is probed additively while throughput keeps up,
+    and backed off multiplicatively when errors exceed `error_threshold`, or when the last probe
+    made throughput drop or latency rise (the gradient says we are past the knee).
+
+    Pools feed their own metrics to the controllers attached to them: `DiskPool` reports copy
+    bandwidth. Pass controllers to `exp_func(controllers=...)` to feed task completions, latency
+    and errors (e.g. OOM for `CUDAPool.min_memory`).
+
+    Example:
+        `AIMDController(disk, "max_copys", lower=1, upper=8)`
+        `AIMDController(cuda, "min_memory", lower=50, upper=95, inverse=True,
+        probe=lambda: cuda.memory_headroom() > 20)`
+
+    Args:
+        target (`Any`): The object holding the limit, usually a pool.
+        attribute (`str`): The name of the limit, e.g. `"max_copys"`, `"min_memory"` or `"size"`.
+        lower (`float`): The lowest limit.
+        upper (`float`): The highest limit.
+        increase (`float`, optional): Additive increase of a probe. Defaults to 1.
+        decrease (`float`, optional): Multiplicative decrease of a back off. Defaults to 0.5.
+        interval (`float`, optional): Seconds between two decisions. Defaults to 30.
+        tolerance (`float`, optional): Relative throughput drop or latency rise that triggers a back off. Defaults to 0.1.
+        error_threshold (`float`, optional): Error rate that triggers a back off. Defaults to 0.1.
+        inverse (`bool`, optional): A lower limit means more concurrency, e.g. `min_memory`. Defaults to False.
+        probe (`Optional[Callable[[], bool]]`, optional): Only probe when this returns True, e.g. enough GPU memory headroom.
+        max_decisions (`int`, optional): The number of decisions kept for inspection. Defaults to 100.
+    """
+
+    def __init__(
+        self,
+        target: Any,
+        attribute: str,
+        lower: float,
+        upper: float,
+        increase: float = 1,
+        decrease: float = 0.5,
+        interval: float = 30.0,
+        tolerance: float = 0.1,
+        error_threshold: float = 0.1,
+        inverse: bool = False,
+        probe: Optional[Callable[[], bool]] = None,
+        max_decisions: int = 100,
+    ):
+        self.target = target
+        self.attribute = attribute
+        self.lower = lower
+        self.upper = upper
+        self.increase = increase
+        self.decrease = decrease
+        self.interval = interval
+        self.tolerance = tolerance
+        self.error_threshold = error_threshold
+        self.inverse = inverse
+        self.probe = probe
+        self.decisions: Deque[Decision] = deque(maxlen=max_decisions)
+
+        self.last_throughput: Optional[float] = None
+        self.last_latency: Optional[float] = None
+        self.last_action: Optional[str] = None
+        self._reset(time.monotonic())
+
+        if hasattr(target, "controllers"):
+            target.controllers = [*target.controllers, self]
+
+    def _reset(self, now: float):
+        self._window_start = now
+        self._amount = 0.0
+        self._count = 0
+        self._errors = 0
+        self._latency = 0.0
+        self._latency_count = 0
+
+    @property
+    def limit(self):
+        return getattr(self.target, self.attribute)
+
+    @limit.setter
+    def limit(self, value):
+        setattr(self.target, self.attribute, value)
+
+    def _clip(self, value: float, old: Any) -> Any:
+        value = min(self.upper, max(self.lower, value))
+        return round(value) if isinstance(old, int) else value
+
+    def _grow(self, old: Any) -> Any:
+        step = -self.increase if self.inverse else self.increase
+        return self._clip(old + step, old)
+
+    def _back_off(self, old: Any) -> Any:
+        if self.inverse:
+            return self._clip(self.upper - (self.upper - old) * self.decrease, old)
+        new = self._clip(old * self.decrease, old)
+        # integer limits always move
+        return min(new, max(self.lower, old - 1)) if isinstance(old, int) else new
+
+    def record(self, amount: float = 1.0, error: bool = False, latency: Optional[float] = None):
+        """Feed a sample: `amount` of work done (e.g. bytes or tasks), whether it failed and its
+        latency in seconds."""
+        self._amount += amount
+        self._count += 1
+        self._errors += bool(error)
+        if latency is not None:
+            self._latency += latency
+            self._latency_count += 1
+        if time.monotonic() - self._window_start >= self.interval:
+            self.step()
+
+    def step(self) -> Optional[Decision]:
+        """Decide the limit from the samples since the last step."""
+        now = time.monotonic()
+        if self._count == 0:
+            # no demand, nothing to learn
+            self._reset(now)
+            return None
+
+        throughput = self._amount / max(now - self._window_start, 1e-9)
+        error_rate = self._errors / self._count
+        latency = self._latency / self._latency_count if self._latency_count else None
+
+        # compare with the window before the last probe
+        dropped = rose = False
+        if self.last_action == "probe" and self.last_throughput is not None:
+            dropped = throughput < self.last_throughput * (1 - self.tolerance)
+            rose = (latency is not None and self.last_latency is not None
+                    and latency > self.last_latency * (1 + self.tolerance)
+                    and throughput <= self.last_throughput * (1 + self.tolerance))
+
+        old = self.limit
+        if error_rate > self.error_threshold:
+            new, reason = self._back_off(old), "error rate"
+        elif dropped:
+            new, reason = self._back_off(old), "throughput dropped"
+        elif rose:
+            new, reason = self._back_off(old), "latency rose"
+        elif self.probe is None or self.probe():
+            new, reason = self._grow(old), "probe"
+        else:
+            new, reason = old, "hold"
+
+        self.last_action = "probe" if reason == "probe" else "back off"
+        self.last_throughput, self.last_latency = throughput, latency
+        decision = Decision(time.time(), old, new, reason, throughput, error_rate, latency)
+        self.decisions.append(decision)
+        if new != old:
+            logger.info(f"{self.target!r}.{self.attribute}: {old} -> {new} ({reason}, "
+                        f"throughput={throughput:.3g}/s, error_rate={error_rate:.2f})")
+            self.limit = new
+
+        self._reset(now)
+        return decision
+
+    def __repr__(self) -> str:
+        return (f"AIMDController({self.attribute}={self.limit}, lower={self.lower}, "
+                f"upper={self.upper}, decisions={len(self.decisions)})")
@@ -1,2 +1,5 @@
 from .exp import Exp
 from .func import exp_func
+from .gang import GangScheduler
+from .preempt import Preempted, PreemptionPolicy
+from .retry import RetryPolicy
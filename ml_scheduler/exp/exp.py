@@ -1,14 +1,41 @@
 import asyncio
+import os
+import signal
 import subprocess
+import sys
 import threading
+from collections import deque
 from logging import getLogger
-from typing import Any, Dict, List, Optional, Set
+from typing import IO, TYPE_CHECKING, Any, Deque, Dict, List, Optional, Set
 
 from ..pools.base import BaseAllocator, BaseResources
+from ..pools.cpu import THREAD_ENV_VARS, CPUElement
+from ..threads import run_in_executor
+from .preempt import Preempted
 from .runner import BaseRunner
 
+if TYPE_CHECKING:
+    from .gang import GangScheduler, Request
+
 logger = getLogger(__name__)
 
+# the last lines of stderr kept for `CalledProcessError.stderr`, e.g. to classify OOMs
+STDERR_TAIL_LINES = 100
+
+
+def _tee_stderr(stream: IO[bytes], tail: Deque[bytes]):
+    """Forward the stderr of a subprocess line by line, keeping its last lines in `tail`."""
+    with stream:
+        for line in iter(stream.readline, b""):
+            tail.append(line)
+            out = getattr(sys.stderr, "buffer", None)
+            if out is not None:
+                out.write(line)
+                out.flush()
+            else:
+                sys.stderr.write(line.decode(errors="replace"))
+                sys.stderr.flush()
+
 
 class Exp:
 
@@ -16,33 +43,129 @@ class Exp:
         self.runner = runner
         self.uuid = uuid
         self.resources: Set[BaseResources] = set()
+        self.attempt = 0
+        self.allocations: Dict[str, BaseResources] = {}
+        self.scheduler: Optional["GangScheduler"] = None
+        self.priority: float = 0
+        self.procs: Set[subprocess.Popen] = set()
+        # set when the scheduler suspends this experiment, see `PreemptionPolicy`
+        self.preempted = False
+        self.preemptions = 0
+        # the error of the last attempt, None if it succeeded
+        self.error: Optional[BaseException] = None
 
     async def get(self, alloc: BaseAllocator, *args, **kwargs):
         resource = await alloc(*args, **kwargs)
         self.resources.add(resource)
         return resource
 
+    async def to_thread(self, func, /, *args, **kwargs):
+        """Run a blocking call, e.g. a sync HTTP request, in the `"user"` executor instead of
+        blocking the event loop shared by all experiments."""
+        return await run_in_executor("user", func, *args, **kwargs)
+
+    async def gang(
+        self,
+        scheduler: "GangScheduler",
+        requests: Dict[str, "Request"],
+        priority: float = 0,
+    ) -> Dict[str, BaseResources]:
+        """Get all `requests` at once from `scheduler`."""
+        self.priority = priority
+        allocations = await scheduler.acquire(requests, priority, owner=self)
+        self.scheduler = scheduler
+        self.resources.update(allocations.values())
+        self.allocations = allocations
+        return allocations
+
+    async def preempt(self, sig: int = signal.SIGTERM, grace: float = 60.0):
+        """Ask the running subprocesses to checkpoint and exit with `sig`, and kill them after
+        `grace` seconds. The experiment is then re-queued by its `ExpFunc`.
+
+        Nothing happens if no subprocess is running, e.g. it has just finished."""
+        procs = [proc for proc in self.procs if proc.poll() is None]
+        if not procs:
+            return
+        self.preempted = True
+        for proc in procs:
+            proc.send_signal(sig)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + grace
+        while any(proc.poll() is None for proc in procs) and loop.time() < deadline:
+            await asyncio.sleep(0.5)
+        for proc in procs:
+            if proc.poll() is None:
+                logger.warning(f"Killing {proc.args} of {self.uuid} after {grace}s")
+                proc.kill()
+
     async def cleanup(self):
+        if self.scheduler is not None:
+            self.scheduler.release(self)
+            self.scheduler = None
         for resource in self.resources:
             logger.debug(f"Cleaning up {resource}")
             await resource.cleanup()
         self.resources.clear()
+        self.allocations = {}
+
+    @property
+    def cores(self) -> List[int]:
+        """The CPU cores allocated to this experiment."""
+        return sorted(element.core for resource in self.resources for element in resource
+                      if isinstance(element, CPUElement) and element.is_allocated())
 
     async def run(self, args: List[str], env: Dict[str, str], **kwargs) -> str:
 
         returns = None
+        proc = None
+        cores = self.cores
+        loop = asyncio.get_running_loop()
 
         def run_in_thread(**popen_kwargs):
+            nonlocal proc, returns
             proc = subprocess.Popen(**popen_kwargs)
-            proc.wait()
-            nonlocal returns
-            returns = proc.returncode, proc.stdout.read().decode()
+            if cores and hasattr(os, "sched_setaffinity"):
+                try:
+                    os.sched_setaffinity(proc.pid, cores)
+                except OSError as e:
+                    logger.warning(f"Cannot pin {args} to cores {cores}: {e}")
+            # `procs` is iterated on the loop thread, only change it there
+            loop.call_soon_threadsafe(self.procs.add, proc)
+            tail: Deque[bytes] = deque(maxlen=STDERR_TAIL_LINES)
+            tee = None
+            if proc.stderr is not None:
+                tee = threading.Thread(target=_tee_stderr, args=(proc.stderr, tail), daemon=True)
+                tee.start()
+            try:
+                stdout = proc.stdout.read() if proc.stdout is not None else b""
+                proc.wait()
+                if tee is not None:
+                    tee.join()
+            finally:
+                loop.call_soon_threadsafe(self.procs.discard, proc)
+            returns = proc.returncode, stdout.decode(), b"".join(tail).decode(errors="replace")
             return
 
+        if cores:
+            # do not oversubscribe the allocated cores
+            env = dict(os.environ if env is None else env)
+            for var in THREAD_ENV_VARS:
+                env.setdefault(var, str(len(cores)))
+
+        if self.preemptions:
+            # let the subprocess resume from its checkpoint
+            env = {
+                **(os.environ if env is None else env),
+                "ML_SCHEDULER_RESUME": str(self.preemptions),
+            }
+
         popen_kwargs = {
             "args": args,
             "env": env,
             "stdout": subprocess.PIPE,
+            # still shown, and its tail is attached to `CalledProcessError`
+            "stderr": subprocess.PIPE,
         }
 
         thread = threading.Thread(target=run_in_thread,
@@ -52,12 +175,21 @@ class Exp:
                                   })
         thread.start()
 
-        while thread.is_alive():
-            await asyncio.sleep(1)
-
-        returncode, stdout = returns
+        try:
+            while thread.is_alive():
+                await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            # the experiment is cancelled, do not leave the subprocess behind
+            if proc is not None and proc.poll() is None:
+                logger.info(f"Terminating {args} of {self.uuid}")
+                proc.terminate()
+            raise
+
+        returncode, stdout, stderr = returns
+        if self.preempted:
+            raise Preempted(f"{self.uuid} was preempted (exit code {returncode})")
         if returncode != 0:
-            raise subprocess.CalledProcessError(returncode, args, stdout)
+            raise subprocess.CalledProcessError(returncode, args, stdout, stderr)
 
         return stdout
 
@@ -1,31 +1,85 @@
+import asyncio
 import inspect
+import time
+from functools import cached_property
 from logging import getLogger
-from traceback import format_exc
-from typing import Any, Tuple
+from traceback import format_exception
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Sequence, Tuple, Union
 
+from ..adaptive import AIMDController
 from .exp import Exp
-from .runner.csv import CSVRunner
-from .runner.sqlite import SQLiteRunner
+from .gang import GangScheduler, default_scheduler, parse_request
+from .preempt import Preempted
+from .retry import RetryPolicy
+
+if TYPE_CHECKING:
+    from .runner.csv import CSVRunner
+    from .runner.http import HTTPRunner
+    from .runner.sqlite import SQLiteRunner
 
 logger = getLogger(__name__)
 
 
 class ExpFunc:
 
-    def __init__(self, exp_func) -> None:
+    def __init__(
+        self,
+        exp_func,
+        retry: Optional[RetryPolicy] = None,
+        resources: Union[Dict[str, Any], Callable[..., Dict[str, Any]], None] = None,
+        scheduler: Optional[GangScheduler] = None,
+        priority: Union[str, Callable[..., float], None] = None,
+        controllers: Optional[Sequence[AIMDController]] = None,
+    ) -> None:
         self.exp_func = exp_func
+        self.retry = retry
+        self.resources = resources
+        self.scheduler = scheduler or default_scheduler
+        self.priority = priority
+        self.controllers = controllers or ()
 
-        csv_runner = CSVRunner.set(self)
-        self.run_csv = csv_runner.run
-        self.arun_csv = csv_runner.arun
+    # runners (and pandas) are imported on first use
 
-        sqlite_runner = SQLiteRunner.set(self)
-        self.run_sqlite = sqlite_runner.run
-        self.arun_sqlite = sqlite_runner.arun
+    @cached_property
+    def _csv_runner(self) -> "CSVRunner":
+        from .runner.csv import CSVRunner
+        return CSVRunner.set(self)
 
-    async def __call__(self, exp: Exp, **kwargs) -> Tuple[Exp, Any]:
-        assert isinstance(exp, Exp)
+    @cached_property
+    def _sqlite_runner(self) -> "SQLiteRunner":
+        from .runner.sqlite import SQLiteRunner
+        return SQLiteRunner.set(self)
+
+    @cached_property
+    def _http_runner(self) -> "HTTPRunner":
+        from .runner.http import HTTPRunner
+        return HTTPRunner.set(self)
+
+    @property
+    def run_csv(self):
+        return self._csv_runner.run
+
+    @property
+    def arun_csv(self):
+        return self._csv_runner.arun
 
+    @property
+    def run_sqlite(self):
+        return self._sqlite_runner.run
+
+    @property
+    def arun_sqlite(self):
+        return self._sqlite_runner.arun
+
+    @property
+    def run_http(self):
+        return self._http_runner.run
+
+    @property
+    def arun_http(self):
+        return self._http_runner.arun
+
+    def _bind(self, exp: Exp, kwargs: Dict[str, Any]) -> Dict[str, Any]:
         # filter out kwargs that are not needed
         need_kwargs = inspect.signature(self.exp_func).parameters.keys()
         filtered_kwargs = {k: v for k, v in kwargs.items() if k in need_kwargs}
@@ -37,17 +91,115 @@ class ExpFunc:
         for key, value in exp_func_kwargs.items():
             if value == float('nan'):
                 exp_func_kwargs[key] = None
+        return exp_func_kwargs
+
+    @staticmethod
+    def _call_on_row(func: Callable, kwargs: Dict[str, Any]):
+        params = inspect.signature(func).parameters
+        if not any(p.kind == p.VAR_KEYWORD for p in params.values()):
+            kwargs = {k: v for k, v in kwargs.items() if k in params}
+        return func(**kwargs)
 
-        try:
-            results = await self.exp_func(**exp_func_kwargs)
-        except Exception as e:
-            logger.warning(format_exc())
-            logger.error(f"Error in {self.exp_func.__name__}: {e}")
-            results = ""
+    def _declare(self, kwargs: Dict[str, Any]):
+        """Evaluate the declared resources on the row."""
+        resources = self.resources
+        if callable(resources):
+            resources = self._call_on_row(resources, kwargs)
+        return {name: parse_request(spec) for name, spec in resources.items()}
+
+    def _priority(self, kwargs: Dict[str, Any]) -> float:
+        if self.priority is None:
+            return 0
+        if callable(self.priority):
+            return self._call_on_row(self.priority, kwargs)
+        priority = kwargs.get(self.priority)
+        return 0 if priority is None or priority != priority else float(priority)
+
+    async def __call__(self, exp: Exp, **kwargs) -> Tuple[Exp, Any]:
+        assert isinstance(exp, Exp)
+
+        while True:
+            exp.attempt += 1
+            error = None
+            start = time.monotonic()
+            try:
+                if self.resources is not None:
+                    await exp.gang(self.scheduler, self._declare(kwargs), self._priority(kwargs))
+                results = await self.exp_func(**self._bind(exp, kwargs))
+            except Exception as e:
+                error = e
+                results = ""
+            finally:
+                # release the resources between attempts so other work can run
+                await exp.cleanup()
+
+            preempted, exp.preempted = exp.preempted, False
+            if preempted and isinstance(error, Preempted):
+                # suspended by the scheduler: re-queue without counting an attempt
+                exp.preemptions += 1
+                exp.attempt -= 1
+                logger.info(f"Re-queued {exp.uuid} after preemption ({exp.preemptions})")
+                continue
+
+            exp.error = error
+            for controller in self.controllers:
+                controller.record(1, error=error is not None, latency=time.monotonic() - start)
+            if error is None:
+                break
+
+            kind = None
+            if self.retry is not None and exp.attempt < self.retry.max_attempts:
+                kind = self.retry.classify(error)
+            if kind is None:
+                logger.warning("".join(format_exception(type(error), error, error.__traceback__)))
+                logger.error(f"Error in {self.exp_func.__name__}: {error}")
+                break
+
+            if kind == "oom" and self.retry.escalate is not None:
+                kwargs = self.retry.escalate(kwargs)
+            delay = self.retry.delay(exp.attempt)
+            logger.warning(
+                f"Error in {self.exp_func.__name__} ({kind}): {error}. Retrying {exp.uuid} in "
+                f"{delay:.1f}s ({exp.attempt}/{self.retry.max_attempts})")
+            await asyncio.sleep(delay)
 
-        await exp.cleanup()
         return (exp, results)
 
 
-def exp_func(func):
-    return ExpFunc(func)
+def exp_func(
+    func=None,
+    *,
+    retry: Union[int, RetryPolicy, None] = None,
+    resources: Union[Dict[str, Any], Callable[..., Dict[str, Any]], None] = None,
+    scheduler: Optional[GangScheduler] = None,
+    priority: Union[str, Callable[..., float], None] = None,
+    controllers: Optional[Sequence[AIMDController]] = None,
+):
+    """Mark an async function as an experiment function.
+
+    Args:
+        retry (`Union[int, RetryPolicy, None]`, optional): Retry policy of failed experiments. An
+            integer is the maximum number of attempts. Defaults to no retry.
+        resources (`Union[Dict[str, Any], Callable[..., Dict[str, Any]], None]`, optional):
+            Resources declared ahead of time, as `{name: (allocator, *args)}` or a function of the
+            row returning it, e.g. `lambda model: {"cuda": (cuda.allocate, 2), "disk":
+            (disk.copy_folder, f"/src/{model}", f"/tgt/{model}")}`. They are allocated all at
+            once before the function starts and available as `exp.allocations[name]`.
+        scheduler (`Optional[GangScheduler]`, optional): The scheduler placing the declared
+            resources. Defaults to a scheduler shared by all experiment functions.
+        priority (`Union[str, Callable[..., float], None]`, optional): The column holding the
+            priority of a row, or a function of the row returning it. Higher priority experiments
+            are placed first and may preempt lower ones, see `PreemptionPolicy`. Defaults to 0.
+        controllers (`Optional[Sequence[AIMDController]]`, optional): Controllers fed with each
+            attempt: one completed task, whether it failed and its latency. Defaults to none.
+    """
+    kwargs = {
+        "retry": RetryPolicy.from_arg(retry),
+        "resources": resources,
+        "scheduler": scheduler,
+        "priority": priority,
+        "controllers": controllers,
+    }
+    if func is None:
+        return lambda func: ExpFunc(func, **kwargs)
+    return ExpFunc(func, **kwargs)
@@ -0,0 +1,194 @@
+import asyncio
+import functools
+import itertools
+from logging import getLogger
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+from ..pools.base import BaseAllocator, BaseResources
+from .preempt import PreemptionPolicy
+
+if TYPE_CHECKING:
+    from .exp import Exp
+
+logger = getLogger(__name__)
+
+Request = Tuple[BaseAllocator, tuple, Dict[str, Any]]
+
+
+def parse_request(spec: Any) -> Request:
+    """Parse a declared resource: `(allocator, *args)` or `functools.partial(allocator, ...)`."""
+    if isinstance(spec, functools.partial):
+        return spec.func, spec.args, spec.keywords
+    if isinstance(spec, tuple) and spec and isinstance(spec[0], BaseAllocator):
+        return spec[0], spec[1:], {}
+    raise TypeError(f"Expect (allocator, *args) or functools.partial, got {spec!r}")
+
+
+class _Gang:
+
+    def __init__(
+        self,
+        requests: Dict[str, Request],
+        priority: float,
+        seq: int,
+        owner: Optional["Exp"],
+    ):
+        self.requests = requests
+        self.priority = priority
+        self.seq = seq
+        self.owner = owner
+        self.sizes: Dict[str, int] = {}
+        self.allocations: Dict[str, BaseResources] = {}
+        self.future = asyncio.get_running_loop().create_future()
+
+    def dominant_share(self) -> float:
+        """The largest fraction of a pool this gang asks for."""
+        return max(
+            (self.sizes[name] / max(alloc.pool.capacity, 1)
+             for name, (alloc, _, _) in self.requests.items()),
+            default=0,
+        )
+
+
+class GangScheduler:
+    """Place experiments by their full resource requirement vector and allocate all of their
+    resources at once, so no experiment holds some resources while waiting for the others.
+
+    Args:
+        policy (`str`, optional): `"pack"` places the waiting experiments by multi-dimensional
+            first-fit decreasing on their dominant share. `"fifo"` places them strictly in order.
+            Higher priority experiments are always considered first. Defaults to `"pack"`.
+        interval (`float`, optional): Seconds between two placement passes. Defaults to 1.
+        preemption (`Optional[PreemptionPolicy]`, optional): Suspend lower priority experiments
+            when a higher priority one cannot be placed. Defaults to no preemption.
+    """
+
+    def __init__(
+        self,
+        policy: str = "pack",
+        interval: float = 1.0,
+        preemption: Optional[PreemptionPolicy] = None,
+    ):
+        if policy not in ("pack", "fifo"):
+            raise ValueError(f"Unknown policy {policy}")
+        self.policy = policy
+        self.interval = interval
+        self.preemption = preemption
+        self.waiting: List[_Gang] = []
+        self.running: List[_Gang] = []
+        self._preempting: Set[asyncio.Task] = set()
+        self._seq = itertools.count()
+        self._ticker: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _order(self) -> List[_Gang]:
+        if self.policy == "fifo":
+            return sorted(self.waiting, key=lambda g: (-g.priority, g.seq))
+        return sorted(self.waiting, key=lambda g: (-g.priority, -g.dominant_share(), g.seq))
+
+    async def _place(self, gang: _Gang) -> bool:
+        allocations: Dict[str, BaseResources] = {}
+        for name, (alloc, args, kwargs) in gang.requests.items():
+            allocated = await alloc.try_allocate(gang.sizes[name], *args, **kwargs)
+            if allocated is None:
+                for resources in allocations.values():
+                    resources.release()
+                return False
+            allocations[name] = allocated
+
+        gang.allocations = allocations
+        gang.future.set_result(allocations)
+        return True
+
+    def _preempt(self, order: List[_Gang]):
+        if any(held.owner.preempted for held in self.running):
+            # wait for the previous victims to release their resources
+            return
+
+        for gang in order:
+            if gang.future.done():
+                continue
+            victims = self.preemption.select(gang, self.running)
+            for exp in victims:
+                logger.info(f"Preempting {exp.uuid} (priority {exp.priority}) for priority "
+                            f"{gang.priority}")
+                task = asyncio.create_task(
+                    exp.preempt(self.preemption.signal, self.preemption.grace))
+                self._preempting.add(task)
+                task.add_done_callback(self._preempting.discard)
+            if victims:
+                return
+
+    async def schedule(self):
+        """Run one placement pass over the waiting experiments."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # the scheduler may outlive an event loop, e.g. across `asyncio.run`
+            self._loop, self._lock, self._ticker = loop, asyncio.Lock(), None
+        async with self._lock:
+            for gang in list(self.waiting):
+                for name, (alloc, args, kwargs) in gang.requests.items():
+                    gang.sizes[name] = await alloc._get_size(*args, **kwargs)
+
+            order = self._order()
+            for gang in order:
+                if gang.future.done():
+                    continue
+                if await self._place(gang):
+                    self.waiting.remove(gang)
+                elif self.policy == "fifo":
+                    break
+
+            if self.preemption is not None and self.waiting:
+                self._preempt(order)
+
+    async def _tick(self):
+        while self.waiting:
+            await asyncio.sleep(self.interval)
+            await self.schedule()
+
+    async def acquire(
+        self,
+        requests: Dict[str, Request],
+        priority: float = 0,
+        owner: Optional["Exp"] = None,
+    ) -> Dict[str, BaseResources]:
+        """Wait until all `requests` are allocated together, then run their callbacks. `owner`
+        holds the resources until `release` and can be preempted."""
+        gang = _Gang(requests, priority, next(self._seq), owner)
+        self.waiting.append(gang)
+        try:
+            await self.schedule()
+            if self._ticker is None or self._ticker.done():
+                self._ticker = asyncio.create_task(self._tick())
+            allocations = await gang.future
+        except asyncio.CancelledError:
+            if gang in self.waiting:
+                self.waiting.remove(gang)
+            elif gang.future.done() and not gang.future.cancelled():
+                for resources in gang.future.result().values():
+                    resources.release()
+            raise
+
+        try:
+            await asyncio.gather(*(alloc._callback(allocations[name], *args, **kwargs)
+                                   for name, (alloc, args, kwargs) in requests.items()))
+        except BaseException:
+            for resources in allocations.values():
+                await resources.cleanup()
+            raise
+
+        if owner is not None:
+            self.running.append(gang)
+        return allocations
+
+    def release(self, owner: "Exp"):
+        """Forget the resources held by `owner`, which cleans them up itself."""
+        self.running = [held for held in self.running if held.owner is not owner]
+
+    def __repr__(self) -> str:
+        return f"GangScheduler(policy={self.policy}, waiting={len(self.waiting)})"
+
+
+default_scheduler = GangScheduler()
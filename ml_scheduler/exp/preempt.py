@@ -0,0 +1,82 @@
+import signal
+from logging import getLogger
+from typing import TYPE_CHECKING, Dict, List
+
+if TYPE_CHECKING:
+    from .exp import Exp
+    from .gang import _Gang
+
+logger = getLogger(__name__)
+
+
+class Preempted(Exception):
+    """Raised by `exp.run` when the experiment was preempted, even if the subprocess exited
+    cleanly after checkpointing, so the cut-short run is not taken as finished."""
+
+
+class PreemptionPolicy:
+    """Decide which running experiments to suspend so that a higher priority one can start.
+
+    Victims are signalled (`signal`), given `grace` seconds to checkpoint and exit, then killed.
+    Their resources are released and their rows are re-queued with `exp.preemptions` increased,
+    which the experiment function can use to resume from its checkpoint.
+
+    Only experiments with declared resources (see `exp_func(resources=...)`) and a running
+    `exp.run` subprocess can be preempted. Override `select` for other policies.
+
+    Args:
+        signal (`int`, optional): The signal asking the subprocess to checkpoint. Defaults to `SIGTERM`.
+        grace (`float`, optional): Seconds to wait for the subprocess before killing it. Defaults to 60.
+        min_priority_gap (`float`, optional): Only preempt experiments whose priority is lower by at least this. Defaults to 1.
+    """
+
+    def __init__(
+        self,
+        signal: int = signal.SIGTERM,
+        grace: float = 60.0,
+        min_priority_gap: float = 1,
+    ):
+        self.signal = signal
+        self.grace = grace
+        self.min_priority_gap = min_priority_gap
+
+    def shortfall(self, gang: "_Gang") -> Dict[object, int]:
+        """The size missing in each pool to place `gang`."""
+        missing = {}
+        for name, (alloc, _, _) in gang.requests.items():
+            short = gang.sizes[name] - alloc.pool.available_size
+            if short > 0:
+                missing[alloc.pool] = missing.get(alloc.pool, 0) + short
+        return missing
+
+    def select(self, gang: "_Gang", running: List["_Gang"]) -> List["Exp"]:
+        """Select the victims among the `running` gangs to place `gang`, or none if they cannot
+        free enough resources.
+
+        The default policy preempts the lowest priority experiments first, and among them the most
+        recently started ones, which lose the least work."""
+        missing = self.shortfall(gang)
+        if not missing:
+            return []
+
+        candidates = [
+            held for held in running if held.priority <= gang.priority - self.min_priority_gap
+            and any(proc.poll() is None for proc in held.owner.procs)
+        ]
+        candidates.sort(key=lambda held: (held.priority, -held.seq))
+
+        victims = []
+        for held in candidates:
+            freed = False
+            for name, (alloc, _, _) in held.requests.items():
+                if missing.get(alloc.pool, 0) > 0:
+                    missing[alloc.pool] -= held.allocations[name].size()
+                    freed = True
+            if freed:
+                victims.append(held.owner)
+            if all(short <= 0 for short in missing.values()):
+                return victims
+        return []
+
+    def __repr__(self) -> str:
+        return f"PreemptionPolicy(signal={self.signal}, grace={self.grace})"
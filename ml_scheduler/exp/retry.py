@@ -0,0 +1,108 @@
+import random
+import re
+import subprocess
+from typing import Any, Callable, Collection, Dict, Optional, Pattern, Tuple, Type, Union
+
+DEFAULT_OOM_PATTERNS = (
+    r"CUDA out of memory",
+    r"OutOfMemoryError",
+    r"CUBLAS_STATUS_ALLOC_FAILED",
+)
+
+
+class RetryPolicy:
+    """Declarative retry policy of an experiment function.
+
+    A failed attempt is classified as `"oom"`, `"retry"` or fatal (`None`). Resources are released
+    between attempts, and an OOM attempt can be re-queued with a larger resource request through
+    `escalate`.
+
+    Args:
+        max_attempts (`int`, optional): Maximum number of attempts, including the first one. Defaults to 3.
+        backoff (`float`, optional): Seconds to wait before the first retry. Defaults to 1.
+        backoff_factor (`float`, optional): Multiplier of the delay after each attempt. Defaults to 2.
+        max_backoff (`float`, optional): Upper bound of the delay in seconds. Defaults to 300.
+        jitter (`float`, optional): Randomize the delay by up to this fraction. Defaults to 0.5.
+        retry_on (`Tuple[Type[BaseException], ...]`, optional): Exceptions to retry. Defaults to `(Exception,)`.
+        give_up_on (`Tuple[Type[BaseException], ...]`, optional): Exceptions never retried. Defaults to `()`.
+        retry_on_returncode (`Optional[Collection[int]]`, optional): If set, only retry failed `exp.run` with these exit codes.
+        retry_on_output (`Collection[str]`, optional): If set, only retry failed `exp.run` whose stdout or stderr matches one of these patterns.
+        oom_on (`Tuple[Type[BaseException], ...]`, optional): Exceptions classified as OOM. Defaults to `(MemoryError,)`.
+        oom_patterns (`Collection[str]`, optional): Patterns in the error message, stdout or stderr classified as OOM.
+        escalate (`Optional[Callable[[Dict[str, Any]], Dict[str, Any]]]`, optional): Called with the
+            row kwargs after an OOM attempt, returns the kwargs of the next attempt, e.g.
+            `lambda row: {**row, "num_gpus": row["num_gpus"] * 2}`. Defaults to retry as is.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff: float = 1.0,
+        backoff_factor: float = 2.0,
+        max_backoff: float = 300.0,
+        jitter: float = 0.5,
+        retry_on: Tuple[Type[BaseException], ...] = (Exception, ),
+        give_up_on: Tuple[Type[BaseException], ...] = (),
+        retry_on_returncode: Optional[Collection[int]] = None,
+        retry_on_output: Collection[str] = (),
+        oom_on: Tuple[Type[BaseException], ...] = (MemoryError, ),
+        oom_patterns: Collection[str] = DEFAULT_OOM_PATTERNS,
+        escalate: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    ):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_on = retry_on
+        self.give_up_on = give_up_on
+        self.retry_on_returncode = retry_on_returncode
+        self.retry_on_output = [re.compile(p) for p in retry_on_output]
+        self.oom_on = oom_on
+        self.oom_patterns = [re.compile(p) for p in oom_patterns]
+        self.escalate = escalate
+
+    @classmethod
+    def from_arg(cls, retry: Union[int, "RetryPolicy", None]) -> Optional["RetryPolicy"]:
+        if retry is None or isinstance(retry, RetryPolicy):
+            return retry
+        return cls(max_attempts=retry)
+
+    @staticmethod
+    def _search(patterns: Collection[Pattern], *texts: Optional[str]) -> bool:
+        return any(p.search(t) for p in patterns for t in texts if t)
+
+    def classify(self, exc: BaseException) -> Optional[str]:
+        """Classify a failure as `"oom"`, `"retry"`, or `None` for not retrying."""
+        if isinstance(exc, self.give_up_on):
+            return None
+
+        output = stderr = None
+        if isinstance(exc, subprocess.CalledProcessError):
+            # PyTorch writes its OOM tracebacks to stderr
+            output, stderr = (text.decode(errors="replace") if isinstance(text, bytes) else text
+                              for text in (exc.output, exc.stderr))
+        message = f"{type(exc).__name__}: {exc}"
+
+        if isinstance(exc, self.oom_on) or self._search(self.oom_patterns, message, output,
+                                                        stderr):
+            return "oom"
+
+        if isinstance(exc, subprocess.CalledProcessError):
+            codes = self.retry_on_returncode
+            if codes is not None and exc.returncode not in codes:
+                return None
+            if self.retry_on_output and not self._search(self.retry_on_output, output, stderr):
+                return None
+
+        if isinstance(exc, self.retry_on):
+            return "retry"
+        return None
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait after the `attempt`-th failed attempt."""
+        delay = min(self.max_backoff, self.backoff * self.backoff_factor**(attempt - 1))
+        return max(0.0, delay * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def __repr__(self) -> str:
+        return f"RetryPolicy(max_attempts={self.max_attempts}, backoff={self.backoff})"
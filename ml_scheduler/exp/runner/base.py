@@ -1,6 +1,6 @@
 import asyncio
 from logging import getLogger
-from typing import TYPE_CHECKING, Any, Dict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Set
 
 from typing_extensions import Self
 
@@ -32,6 +32,61 @@ class BaseRunner:
         return asyncio.create_task(self.exp_func(Exp(self, uuid), **kwargs),
                                    name=uuid)
 
+    def _pending_rows(self, df, force_rerun: bool = False):
+        """Select the rows of `df` to run: rows where any of `continue_cols` is null."""
+        if force_rerun:
+            return slice(None)
+
+        rows = False
+        for col in self.continue_cols:
+            if col in df.columns:
+                rows |= df[col].isnull()
+            else:
+                # needs to fill in the empty column
+                return slice(None)
+
+        if isinstance(rows, bool):
+            return slice(None)
+        return rows
+
+    async def _poll(self, running: Set[str]) -> List[asyncio.Task]:
+        """Create tasks for the rows added (or re-nulled) since the last poll, except `running`."""
+        return []
+
+    async def _gather(
+        self,
+        tasks: Iterable[asyncio.Task],
+        retval_column: Optional[str],
+        watch_interval: Optional[float] = None,
+    ):
+        """Block until all tasks are done. If `watch_interval` is set, keep admitting new rows
+        from `_poll` every `watch_interval` seconds until interrupted."""
+        loop = asyncio.get_running_loop()
+        pending = set(tasks)
+        last_poll = loop.time()
+
+        while pending or watch_interval is not None:
+            if pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=watch_interval,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+            else:
+                done = set()
+                await asyncio.sleep(watch_interval)
+
+            for task in done:
+                exp, results = task.result()
+                logger.info(f"Finished {exp.uuid}")
+                if retval_column is not None:
+                    await self._write_cell(exp.uuid, retval_column, results)
+
+            if watch_interval is not None and loop.time() - last_poll >= watch_interval:
+                running = {task.get_name() for task in pending}
+                pending.update(await self._poll(running))
+                last_poll = loop.time()
+
     async def _write_cell(self, uuid: str, metric: str, value: Any):
         raise NotImplementedError("_write_cell method is not implemented")
 
@@ -39,6 +94,19 @@ class BaseRunner:
         logger.info(f"Reporting {uuid} {metrics}")
         for metric, value in metrics.items():
             await self._write_cell(uuid, metric, value)
+        self._settle(uuid, metrics)
+
+    def _settle(self, uuid: str, metrics: Dict[str, Any]):
+        """Forget a null row once all of its `continue_cols` are reported, so `_poll` admits
+        it again if it is re-nulled later."""
+        known_null = getattr(self, "_known_null", None)
+        if known_null is None or uuid not in known_null:
+            return
+        filled = self._filled.setdefault(uuid, set())
+        filled.update(k for k, v in metrics.items() if k in self.continue_cols and v is not None)
+        if filled.issuperset(self.continue_cols):
+            known_null.discard(uuid)
+            del self._filled[uuid]
 
     def run(self, *args, **kwargs):
         raise NotImplementedError("run method is not implemented")
@@ -1,4 +1,5 @@
 import asyncio
+import io
 import os
 import shutil
 from logging import getLogger
@@ -8,7 +9,8 @@ from uuid import uuid4
 import pandas
 import readchar
 
-from ...threads import to_thread
+from ...logs import install_logging
+from ...threads import detect_stalls, run_in_executor
 from .base import BaseRunner
 
 logger = getLogger(__name__)
@@ -16,6 +18,9 @@ logger = getLogger(__name__)
 
 class CSVRunner(BaseRunner):
 
+    _fingerprint_size = 256
+    _snapshot = None
+
     def run(
         self,
         csv_path: str,
@@ -25,6 +30,8 @@ class CSVRunner(BaseRunner):
         uuid_column: str = ":uuid:",
         retval_column: Optional[str] = ":retval:",
         extra_kwargs: Optional[Dict[str, Any]] = None,
+        watch: bool = False,
+        watch_interval: float = 5.0,
     ):
         """Run experiments from a csv file
 
@@ -36,6 +43,8 @@ class CSVRunner(BaseRunner):
             uuid_column (`str`, optional): The column name for the uuid. Defaults to `":uuid:"`.
             retval_column (`Optional[str]`, optional): The column name for the return value. None for not saving the return value. Defaults to `":retval:"`.
             extra_kwargs (`Optional[Dict[str, Any]]`, optional): Extra kwargs passed to exp_func.
+            watch (`bool`, optional): Keep running and admit rows appended to (or re-nulled in) the csv file without restarting. Defaults to False.
+            watch_interval (`float`, optional): Seconds between two checks of the csv file. Defaults to 5.
         """
         kwargs = {
             "csv_path": csv_path,
@@ -45,6 +54,8 @@ class CSVRunner(BaseRunner):
             "uuid_column": uuid_column,
             "retval_column": retval_column,
             "extra_kwargs": extra_kwargs,
+            "watch": watch,
+            "watch_interval": watch_interval,
         }
         return asyncio.run(self.arun(**kwargs))
 
@@ -79,27 +90,15 @@ class CSVRunner(BaseRunner):
         df = df.set_index(self.uuid_column)
         df.to_csv(self.csv_path, index=True)
 
-        # force rerun
-        if not force_rerun:
-            rows = False
-            for col in self.continue_cols:
-                if col in df.columns:
-                    rows |= df[col].isnull()
-                else:
-                    # needs to fill in the empty column
-                    rows = False
-                    break
-
-            if isinstance(rows, bool):
-                rows = slice(None)
-                logger.info(f"Adding {len(df)} tasks.")
-            else:
-                added = int(rows.sum())
-                logger.info(
-                    f"Adding {added} tasks ({len(df) - added} skipped).")
-        else:
-            rows = slice(None)
+        rows = self._pending_rows(df, force_rerun)
+        if isinstance(rows, slice):
             logger.info(f"Adding {len(df)} tasks.")
+        else:
+            added = int(rows.sum())
+            logger.info(f"Adding {added} tasks ({len(df) - added} skipped).")
+        self._known_null = set(df[rows].index)
+        self._filled = {}
+        self._synced()
 
         tasks = [
             self.create_task(uuid, **row, **self.extra_kwargs)
@@ -108,9 +107,16 @@ class CSVRunner(BaseRunner):
 
         return tasks
 
-    async def _write_cell(self, row, col, value):
+    def _synced(self, stat: Optional[os.stat_result] = None):
+        """Remember the state of the csv file we have seen, so `_poll` only reads the changes."""
+        stat = stat or os.stat(self.csv_path)
+        with open(self.csv_path, "rb") as f:
+            self._header = f.readline()
+            f.seek(max(stat.st_size - self._fingerprint_size, 0))
+            self._fingerprint = f.read()
+        self._snapshot = (stat.st_mtime_ns, stat.st_size)
 
-        lock_file = "." + self.csv_path + ".lock"
+    async def _wait_lock(self, lock_file: str) -> bool:
         timeout = 100
         counts = 0
         while os.path.exists(lock_file):
@@ -118,11 +124,88 @@ class CSVRunner(BaseRunner):
             counts += 1
             if counts == timeout:
                 logger.error(f"Timeout waiting for lock file {lock_file}")
-                return
+                return False
+        return True
+
+    def _read_changes(self, lock_file: str, stat: os.stat_result):
+        """Read the rows appended since the last sync, or the whole file if it was edited
+        in place. Rows without uuid are assigned one. Returns `(df, appended_only)`."""
+        shutil.copy(self.csv_path, lock_file)
+        try:
+            offset = self._snapshot[1] if self._snapshot is not None else 0
+            with open(self.csv_path, "rb") as f:
+                f.seek(max(offset - len(self._fingerprint), 0))
+                appended = offset > 0 and stat.st_size > offset and f.read(
+                    len(self._fingerprint)) == self._fingerprint
+                tail = f.read() if appended else b""
+
+            if appended:
+                df = pandas.read_csv(
+                    io.BytesIO(self._header + tail),
+                    index_col=self.uuid_column,
+                    **self.read_csv_kwargs,
+                )
+            else:
+                df = pandas.read_csv(
+                    self.csv_path,
+                    index_col=self.uuid_column,
+                    **self.read_csv_kwargs,
+                )
+
+            rows = df.index.isnull()
+            if rows.any():
+                df.index = [str(uuid4()) if r else u for u, r in zip(df.index, rows)]
+                df.index.name = self.uuid_column
+                if appended:
+                    with open(self.csv_path, "r+b") as f:
+                        f.truncate(offset)
+                    df.to_csv(self.csv_path, mode="a", header=False, index=True)
+                else:
+                    df.to_csv(self.csv_path, index=True)
+            self._synced()
+            return df, appended
+        except Exception:
+            shutil.copy(lock_file, self.csv_path)
+            raise
+        finally:
+            os.remove(lock_file)
+
+    async def _poll(self, running):
+        lock_file = "." + self.csv_path + ".lock"
+        try:
+            stat = os.stat(self.csv_path)
+        except FileNotFoundError:
+            return []
+        if (stat.st_mtime_ns, stat.st_size) == self._snapshot:
+            return []
+        async with self._table_lock:
+            if not await self._wait_lock(lock_file):
+                return []
+            try:
+                df, appended = await run_in_executor("table", self._read_changes, lock_file, stat)
+            except Exception as e:
+                logger.warning(f"Error reading changes of {self.csv_path}: {e}")
+                return []
+
+        null = set(df[self._pending_rows(df)].index)
+        admit = null - self._known_null - running
+        self._known_null = self._known_null | null if appended else null
+        if admit:
+            logger.info(f"Adding {len(admit)} tasks from {self.csv_path}.")
+
+        return [
+            self.create_task(uuid, **row, **self.extra_kwargs)
+            for uuid, row in df[df.index.isin(admit)].iterrows()
+        ]
+
+    async def _write_cell(self, row, col, value):
+
+        lock_file = "." + self.csv_path + ".lock"
 
         def _write_atomic(lock_file, csv_path, row, col, value):
             shutil.copy(csv_path, lock_file)
             try:
+                stat = os.stat(csv_path)
                 df = pandas.read_csv(
                     csv_path,
                     index_col=self.uuid_column,
@@ -130,14 +213,25 @@ class CSVRunner(BaseRunner):
                 )
                 df.loc[row, col] = value
                 df.to_csv(csv_path, index=True)
+                if self._snapshot is None:
+                    pass
+                elif (stat.st_mtime_ns, stat.st_size) != self._snapshot or df.index.isnull().any():
+                    # edited by others since the last poll, let `_poll` read it all
+                    self._snapshot = None
+                else:
+                    self._synced()
             except Exception as e:
                 shutil.copy(lock_file, csv_path)
                 logger.warning(f"Error writing to csv: {e}")
             finally:
                 os.remove(lock_file)
 
-        await to_thread(_write_atomic, lock_file, self.csv_path, row, col,
-                        value)
+        # the lock file only guards against other processes, writes of this one take turns
+        async with self._table_lock:
+            if not await self._wait_lock(lock_file):
+                return
+            await run_in_executor("table", _write_atomic, lock_file, self.csv_path, row, col,
+                                  value)
 
     async def arun(
         self,
@@ -148,20 +242,25 @@ class CSVRunner(BaseRunner):
         uuid_column: str = ":uuid:",
         retval_column: Optional[str] = ":retval:",
         extra_kwargs: Optional[Dict[str, Any]] = None,
+        watch: bool = False,
+        watch_interval: float = 5.0,
     ):
         """Async run experiments from a csv file"""
+        install_logging()
+        detector = detect_stalls()
 
         self.csv_path = csv_path
+        self._table_lock = asyncio.Lock()
         self.continue_cols = continue_cols
         self.read_csv_kwargs = read_csv_kwargs or {}
         self.uuid_column = uuid_column
         self.extra_kwargs = extra_kwargs or {}
 
-        tasks = self.submit_from(force_rerun)
+        try:
+            tasks = self.submit_from(force_rerun)
 
-        # block until all tasks are done
-        for task in asyncio.as_completed(tasks):
-            exp, results = await task
-            logger.info(f"Finished {exp.uuid}")
-            if retval_column is not None:
-                await self._write_cell(exp.uuid, retval_column, results)
+            # block until all tasks are done, admitting rows added to the csv if watching
+            await self._gather(tasks, retval_column, watch_interval if watch else None)
+        finally:
+            if detector is not None:
+                detector.stop()
@@ -0,0 +1,313 @@
+import asyncio
+import json
+from collections import deque
+from logging import getLogger
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+from uuid import uuid4
+
+from ...logs import install_logging
+from ...threads import detect_stalls
+from .base import BaseRunner
+
+logger = getLogger(__name__)
+
+_REASONS = {
+    200: "OK",
+    201: "Created",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+}
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class HTTPRunner(BaseRunner):
+    """Keep a warm scheduler process alive and accept experiments over a local HTTP/JSON API.
+
+    Endpoints:
+        `POST /experiments`: submit one row (a JSON object). Returns its uuid.
+        `POST /experiments/bulk`: submit a list of rows, all or none of them. Returns their uuids.
+        `GET /experiments`: status of all experiments: `running`, `finished`, `failed` (with
+            its `error`) or `cancelled`. Only the last `max_finished` done experiments are kept.
+        `GET /experiments/<uuid>?wait=<seconds>`: status and metrics of one experiment. With
+            `wait`, long poll until the experiment is done or the timeout expires.
+        `DELETE /experiments/<uuid>`: cancel a running experiment.
+        `GET /events`: server-sent events stream of every state change and reported metric.
+        `GET /events/poll?since=<seq>&wait=<seconds>`: long polling alternative to `/events`.
+    """
+
+    def run(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        uuid_column: str = ":uuid:",
+        retval_column: Optional[str] = ":retval:",
+        extra_kwargs: Optional[Dict[str, Any]] = None,
+        max_events: int = 10000,
+        max_finished: int = 10000,
+    ):
+        """Serve experiments over HTTP until interrupted
+
+        Args:
+            host (`str`, optional): The interface to bind. Defaults to `"127.0.0.1"`.
+            port (`int`, optional): The port to bind. Defaults to 8000.
+            uuid_column (`str`, optional): The key of a submitted row holding its uuid. A new uuid is generated if missing. Defaults to `":uuid:"`.
+            retval_column (`Optional[str]`, optional): The metric name for the return value. None for not saving the return value. Defaults to `":retval:"`.
+            extra_kwargs (`Optional[Dict[str, Any]]`, optional): Extra kwargs passed to exp_func.
+            max_events (`int`, optional): The number of events kept for long polling. Defaults to 10000.
+            max_finished (`int`, optional): The number of done experiments kept for status queries. Defaults to 10000.
+        """
+        kwargs = {
+            "host": host,
+            "port": port,
+            "uuid_column": uuid_column,
+            "retval_column": retval_column,
+            "extra_kwargs": extra_kwargs,
+            "max_events": max_events,
+            "max_finished": max_finished,
+        }
+        return asyncio.run(self.arun(**kwargs))
+
+    def _validate(self, row: Any) -> Tuple[str, Dict[str, Any]]:
+        """The uuid and kwargs of a submitted row, or an `HTTPError` if it cannot run."""
+        if not isinstance(row, dict):
+            raise HTTPError(400, "An experiment must be a JSON object")
+        row = dict(row)
+        uuid = row.pop(self.uuid_column, None) or str(uuid4())
+        if uuid in self.tasks and not self.tasks[uuid].done():
+            raise HTTPError(409, f"Experiment {uuid} is still running")
+        return uuid, row
+
+    def submit(self, row: Dict[str, Any]) -> str:
+        return self._start(*self._validate(row))
+
+    def submit_bulk(self, rows: List[Dict[str, Any]]) -> List[str]:
+        """Submit all `rows` or, if any of them cannot run, none."""
+        if not isinstance(rows, list):
+            raise HTTPError(400, "Bulk submission must be a JSON list")
+        validated = [self._validate(row) for row in rows]
+        seen = set()
+        for uuid, _ in validated:
+            if uuid in seen:
+                raise HTTPError(409, f"Experiment {uuid} is submitted twice")
+            seen.add(uuid)
+        return [self._start(uuid, row) for uuid, row in validated]
+
+    def _start(self, uuid: str, row: Dict[str, Any]) -> str:
+        if uuid in self.finished:
+            # submitted again: not evicted while running
+            self.finished.remove(uuid)
+        self.experiments[uuid] = {
+            "uuid": uuid,
+            "status": "running",
+            "kwargs": row,
+            "metrics": {},
+        }
+        task = self.create_task(uuid, **row, **self.extra_kwargs)
+        task.add_done_callback(self._on_done)
+        self.tasks[uuid] = task
+        self._emit("submitted", uuid, row)
+        return uuid
+
+    def cancel(self, uuid: str):
+        if uuid not in self.tasks:
+            raise HTTPError(404, f"Experiment {uuid} not found")
+        if self.tasks[uuid].done():
+            raise HTTPError(409, f"Experiment {uuid} is already done")
+        self.tasks[uuid].cancel()
+
+    def _on_done(self, task: asyncio.Task):
+        uuid = task.get_name()
+        experiment = self.experiments[uuid]
+        if task.cancelled():
+            experiment["status"] = "cancelled"
+            self._emit("cancelled", uuid, None)
+        else:
+            exp, results = task.result()
+            logger.info(f"Finished {uuid}")
+            if self.retval_column is not None:
+                experiment["metrics"][self.retval_column] = results
+            if exp.error is not None:
+                experiment["status"] = "failed"
+                experiment["error"] = f"{type(exp.error).__name__}: {exp.error}"
+                self._emit("failed", uuid, {"error": experiment["error"]})
+            else:
+                experiment["status"] = "finished"
+                self._emit("finished", uuid, experiment["metrics"])
+        self._evict(uuid)
+
+    def _evict(self, uuid: str):
+        """Forget the oldest done experiments beyond `max_finished`, like `max_events`."""
+        self.finished.append(uuid)
+        while len(self.finished) > self.max_finished:
+            old = self.finished.popleft()
+            del self.tasks[old]
+            del self.experiments[old]
+
+    def _emit(self, event: str, uuid: str, data: Any):
+        self.seq += 1
+        record = {"seq": self.seq, "event": event, "uuid": uuid, "data": data}
+        self.events.append(record)
+        for queue in self.subscribers:
+            queue.put_nowait(record)
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def _write_cell(self, uuid: str, metric: str, value: Any):
+        self.experiments[uuid]["metrics"][metric] = value
+        self._emit("metric", uuid, {metric: value})
+
+    async def _wait_for(self, predicate, timeout: float):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while not predicate() and (remaining := deadline - loop.time()) > 0:
+            try:
+                await asyncio.wait_for(self.changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+
+    async def _route(
+        self,
+        method: str,
+        path: str,
+        query: Dict[str, List[str]],
+        body: Any,
+    ) -> Tuple[int, Any]:
+        parts = [p for p in path.split("/") if p]
+        wait = float(query.get("wait", ["0"])[0])
+
+        if parts == ["experiments"]:
+            if method == "GET":
+                return 200, list(self.experiments.values())
+            if method == "POST":
+                return 201, {"uuid": self.submit(body)}
+        elif parts == ["experiments", "bulk"]:
+            if method == "POST":
+                return 201, {"uuids": self.submit_bulk(body)}
+        elif len(parts) == 2 and parts[0] == "experiments":
+            uuid = parts[1]
+            if uuid not in self.experiments:
+                raise HTTPError(404, f"Experiment {uuid} not found")
+            if method == "GET":
+                await self._wait_for(lambda: uuid not in self.tasks or self.tasks[uuid].done(),
+                                     wait)
+                if uuid not in self.experiments:
+                    raise HTTPError(404, f"Experiment {uuid} not found")
+                return 200, self.experiments[uuid]
+            if method == "DELETE":
+                self.cancel(uuid)
+                return 200, {"uuid": uuid}
+        elif parts == ["events", "poll"]:
+            if method == "GET":
+                since = int(query.get("since", ["0"])[0])
+                await self._wait_for(lambda: self.seq > since, wait)
+                return 200, [e for e in self.events if e["seq"] > since]
+        else:
+            raise HTTPError(404, f"{path} not found")
+        raise HTTPError(405, f"{method} {path} not allowed")
+
+    async def _stream_events(self, writer: asyncio.StreamWriter):
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\n"
+                     b"Connection: keep-alive\r\n\r\n")
+        queue: asyncio.Queue = asyncio.Queue()
+        self.subscribers.add(queue)
+        try:
+            while True:
+                record = await queue.get()
+                data = json.dumps(record, default=str)
+                writer.write(
+                    f"id: {record['seq']}\nevent: {record['event']}\ndata: {data}\n\n".
+                    encode())
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.subscribers.discard(queue)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode().split()
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                key, _, value = line.decode().partition(":")
+                headers[key.strip().lower()] = value.strip()
+            if len(request_line) < 2:
+                return
+            method, target = request_line[0].upper(), request_line[1]
+            url = urlsplit(target)
+
+            if method == "GET" and url.path.rstrip("/") == "/events":
+                await self._stream_events(writer)
+                return
+
+            try:
+                length = int(headers.get("content-length", 0))
+                raw = await reader.readexactly(length) if length else b""
+                try:
+                    body = json.loads(raw) if raw else None
+                except ValueError:
+                    raise HTTPError(400, "Invalid JSON body")
+                status, payload = await self._route(method, url.path, parse_qs(url.query), body)
+            except HTTPError as e:
+                status, payload = e.status, {"error": e.message}
+            except (TypeError, ValueError) as e:
+                status, payload = 400, {"error": str(e)}
+
+            content = json.dumps(payload, default=str).encode()
+            writer.write(f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                         "Content-Type: application/json\r\n"
+                         f"Content-Length: {len(content)}\r\n"
+                         "Connection: close\r\n\r\n".encode() + content)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def arun(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        uuid_column: str = ":uuid:",
+        retval_column: Optional[str] = ":retval:",
+        extra_kwargs: Optional[Dict[str, Any]] = None,
+        max_events: int = 10000,
+        max_finished: int = 10000,
+    ):
+        """Async serve experiments over HTTP until cancelled"""
+        install_logging()
+        detector = detect_stalls()
+
+        self.uuid_column = uuid_column
+        self.retval_column = retval_column
+        self.extra_kwargs = extra_kwargs or {}
+        self.experiments: Dict[str, Dict[str, Any]] = {}
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self.finished: Deque[str] = deque()
+        self.max_finished = max_finished
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.changed = asyncio.Event()
+        self.seq = 0
+
+        try:
+            server = await asyncio.start_server(self._handle, host, port)
+            # the port actually bound, e.g. with `port=0`
+            self.port = server.sockets[0].getsockname()[1]
+            logger.info(f"Serving experiments on http://{host}:{self.port}")
+            async with server:
+                await server.serve_forever()
+        finally:
+            if detector is not None:
+                detector.stop()
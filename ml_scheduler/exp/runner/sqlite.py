@@ -6,7 +6,8 @@ from uuid import uuid4
 
 import pandas
 
-from ...threads import to_thread
+from ...logs import install_logging
+from ...threads import detect_stalls, run_in_executor
 from .base import BaseRunner
 
 logger = getLogger(__name__)
@@ -23,6 +24,8 @@ class SQLiteRunner(BaseRunner):
         uuid_column: str = ":uuid:",
         retval_column: Optional[str] = ":retval:",
         extra_kwargs: Optional[Dict[str, Any]] = None,
+        watch: bool = False,
+        watch_interval: float = 5.0,
     ):
         """Run experiments from a csv file
 
@@ -33,6 +36,8 @@ class SQLiteRunner(BaseRunner):
             uuid_column (`str`, optional): The column name for the uuid. Defaults to `":uuid:"`.
             retval_column (`Optional[str]`, optional): The column name for the return value. None for not saving the return value. Defaults to `":retval:"`.
             extra_kwargs (`Optional[Dict[str, Any]]`, optional): Extra kwargs passed to exp_func.
+            watch (`bool`, optional): Keep running and admit rows inserted into (or re-nulled in) the table without restarting. Re-nulls are logged by a trigger, dropped when the run ends. Defaults to False.
+            watch_interval (`float`, optional): Seconds between two checks of the table. Defaults to 5.
         """
         kwargs = {
             "sqlite_path": sqlite_path,
@@ -42,6 +47,8 @@ class SQLiteRunner(BaseRunner):
             "uuid_column": uuid_column,
             "retval_column": retval_column,
             "extra_kwargs": extra_kwargs,
+            "watch": watch,
+            "watch_interval": watch_interval,
         }
         return asyncio.run(self.arun(**kwargs))
 
@@ -68,27 +75,16 @@ class SQLiteRunner(BaseRunner):
         df = df.set_index(self.uuid_column)
         df.to_sql(self.table_name, dbcon, if_exists="replace")
 
-        # force rerun
-        if not force_rerun:
-            rows = False
-            for col in self.continue_cols:
-                if col in df.columns:
-                    rows |= df[col].isnull()
-                else:
-                    # needs to fill in the empty column
-                    rows = False
-                    break
-
-            if isinstance(rows, bool):
-                rows = slice(None)
-                logger.info(f"Adding {len(df)} tasks.")
-            else:
-                added = int(rows.sum())
-                logger.info(
-                    f"Adding {added} tasks ({len(df) - added} skipped).")
-        else:
-            rows = slice(None)
+        rows = self._pending_rows(df, force_rerun)
+        if isinstance(rows, slice):
             logger.info(f"Adding {len(df)} tasks.")
+        else:
+            added = int(rows.sum())
+            logger.info(f"Adding {added} tasks ({len(df) - added} skipped).")
+        self._known_null = set(df[rows].index)
+        self._filled = {}
+        self._high_water_mark = dbcon.execute(
+            f'SELECT max(rowid) FROM "{self.table_name}"').fetchone()[0] or 0
 
         tasks = [
             self.create_task(uuid, **row, **self.extra_kwargs)
@@ -97,13 +93,119 @@ class SQLiteRunner(BaseRunner):
 
         return tasks
 
+    def _fetch(self, dbcon, where: str, params=()):
+        query = dbcon.execute(
+            f'SELECT rowid, * FROM "{self.table_name}" WHERE {where}', params)
+        cols = [column[0] for column in query.description]
+        return pandas.DataFrame.from_records(data=query.fetchall(), columns=cols)
+
+    def _start_watch(self) -> sqlite3.Connection:
+        """Open the connection of `_poll`, and log the rows whose `continue_cols` are updated.
+
+        `PRAGMA data_version` only changes for the writes of other connections, hence a
+        connection of its own. The log lets `_poll` read the changed rows only."""
+        dbcon = sqlite3.connect(self.sqlite_path, check_same_thread=False)
+        self._changes = None
+        columns = {row[1] for row in dbcon.execute(f'PRAGMA table_info("{self.table_name}")')}
+        if all(col in columns for col in self.continue_cols):
+            self._changes = f"_ml_scheduler_changes_{self.table_name}"
+            cols = ", ".join(f'"{col}"' for col in self.continue_cols)
+            with dbcon:
+                self._drop_log(dbcon)
+                dbcon.execute(f'CREATE TABLE "{self._changes}" (row INTEGER)')
+                dbcon.execute(f"""
+                    CREATE TRIGGER "{self._changes}" AFTER UPDATE OF {cols} ON "{self.table_name}"
+                    BEGIN INSERT INTO "{self._changes}" VALUES (NEW.rowid); END""")
+        self._data_version = dbcon.execute("PRAGMA data_version").fetchone()[0]
+        return dbcon
+
+    def _drop_log(self, dbcon):
+        dbcon.execute(f'DROP TRIGGER IF EXISTS "{self._changes}"')
+        dbcon.execute(f'DROP TABLE IF EXISTS "{self._changes}"')
+
+    def _stop_watch(self, dbcon: sqlite3.Connection):
+        try:
+            if self._changes is not None:
+                with dbcon:
+                    self._drop_log(dbcon)
+        finally:
+            dbcon.close()
+
+    def _read_changes(self):
+        """Read the rows inserted above the high-water mark and the rows whose `continue_cols`
+        were updated since the last poll. Rows without uuid are assigned one."""
+        dbcon = self.watch_con
+        data_version = dbcon.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return None
+        self._data_version = data_version
+
+        # consume the log and assign uuids at once
+        dbcon.execute("BEGIN IMMEDIATE")
+        try:
+            new = self._fetch(dbcon, "rowid > ?", (self._high_water_mark, ))
+            if len(new):
+                self._high_water_mark = int(new["rowid"].max())
+                rows = new[self.uuid_column].isnull()
+                new.loc[rows, self.uuid_column] = [str(uuid4()) for _ in range(int(rows.sum()))]
+                dbcon.executemany(
+                    f'UPDATE "{self.table_name}" SET "{self.uuid_column}" = ? WHERE rowid = ?',
+                    new.loc[rows, [self.uuid_column, "rowid"]].itertuples(index=False),
+                )
+
+            changed = new.iloc[:0]
+            if self._changes is not None:
+                changed = self._fetch(
+                    dbcon,
+                    f'rowid <= ? AND rowid IN (SELECT row FROM "{self._changes}")',
+                    (self._high_water_mark, ),
+                )
+                dbcon.execute(f'DELETE FROM "{self._changes}"')
+            dbcon.commit()
+        except BaseException:
+            dbcon.rollback()
+            raise
+
+        new = new.drop(columns="rowid").set_index(self.uuid_column)
+        changed = changed.drop(columns="rowid").set_index(self.uuid_column)
+        return new, changed[~changed.index.isin(new.index)]
+
+    async def _poll(self, running):
+        try:
+            changes = await run_in_executor("table", self._read_changes)
+        except Exception as e:
+            logger.warning(f"Error reading changes of {self.table_name}: {e}")
+            return []
+        if changes is None:
+            return []
+        new, changed = changes
+
+        # rows updated but filled are forgotten, so they are admitted if re-nulled later
+        null = set(changed[self._pending_rows(changed)].index)
+        self._known_null -= set(changed.index) - null
+        null |= set(new[self._pending_rows(new)].index)
+
+        admit = null - self._known_null - running
+        self._known_null |= null
+        if admit:
+            logger.info(f"Adding {len(admit)} tasks from {self.table_name}.")
+
+        df = pandas.concat([changed, new])
+        return [
+            self.create_task(uuid, **row, **self.extra_kwargs)
+            for uuid, row in df[df.index.isin(admit)].iterrows()
+        ]
+
     async def _write_cell(self, row, col, value):
 
-        with sqlite3.connect(self.sqlite_path) as dbcon:
-            dbcon.execute(
-                f'UPDATE "{self.table_name}" SET "{col}" = ? WHERE "{self.uuid_column}" = ?',
-                (value, row),
-            )
+        def _write(sqlite_path, row, col, value):
+            with sqlite3.connect(sqlite_path) as dbcon:
+                dbcon.execute(
+                    f'UPDATE "{self.table_name}" SET "{col}" = ? WHERE "{self.uuid_column}" = ?',
+                    (value, row),
+                )
+
+        await run_in_executor("table", _write, self.sqlite_path, row, col, value)
 
     async def arun(
         self,
@@ -114,8 +216,12 @@ class SQLiteRunner(BaseRunner):
         uuid_column: str = ":uuid:",
         retval_column: Optional[str] = ":retval:",
         extra_kwargs: Optional[Dict[str, Any]] = None,
+        watch: bool = False,
+        watch_interval: float = 5.0,
     ):
         """Async run experiments from a csv file"""
+        install_logging()
+        detector = detect_stalls()
 
         self.sqlite_path = sqlite_path
         self.table_name = table_name
@@ -123,13 +229,24 @@ class SQLiteRunner(BaseRunner):
         self.uuid_column = uuid_column
         self.extra_kwargs = extra_kwargs or {}
 
-        with sqlite3.connect(sqlite_path) as dbcon:
-
-            tasks = self.submit_from(dbcon, force_rerun)
-
-            # block until all tasks are done
-            for task in asyncio.as_completed(tasks):
-                exp, results = await task
-                logger.info(f"Finished {exp.uuid}")
-                if retval_column is not None:
-                    await self._write_cell(exp.uuid, retval_column, results)
+        try:
+            dbcon = sqlite3.connect(sqlite_path)
+            try:
+                with dbcon:
+                    tasks = self.submit_from(dbcon, force_rerun)
+            finally:
+                dbcon.close()
+
+            if not watch:
+                await self._gather(tasks, retval_column)
+                return
+
+            self.watch_con = await run_in_executor("table", self._start_watch)
+            try:
+                # block until interrupted, admitting rows added to the table
+                await self._gather(tasks, retval_column, watch_interval)
+            finally:
+                await run_in_executor("table", self._stop_watch, self.watch_con)
+        finally:
+            if detector is not None:
+                detector.stop()
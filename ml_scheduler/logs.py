@@ -0,0 +1,10 @@
+"""Logging setup, deferred until experiments are run so importing the package stays cheap."""
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def install_logging():
+    """Install `coloredlogs` once, on the first run of any runner."""
+    import coloredlogs
+
+    coloredlogs.install()
@@ -1,4 +1,40 @@
+from importlib import import_module
+
 from .base import BasePool
+from .connection import ConnectionPool
 from .counter import CounterPool
-from .cuda import CUDAPool
-from .disk import DiskPool
+from .cpu import CPUPool
+from .rate import RatePool
+from .sources import CopySource, LocalSource, RsyncSource, S3Source
+
+# pools importing heavy backends (NVML, psutil) are loaded on first use
+_lazy = {
+    "CUDAPool": ".cuda",
+    "DiskPool": ".disk",
+    "MemoryPool": ".memory",
+}
+
+__all__ = (
+    "BasePool",
+    "ConnectionPool",
+    "CopySource",
+    "CounterPool",
+    "CPUPool",
+    "LocalSource",
+    "RatePool",
+    "RsyncSource",
+    "S3Source",
+    *_lazy,
+)
+
+
+def __getattr__(name: str):
+    if name in _lazy:
+        value = getattr(import_module(_lazy[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
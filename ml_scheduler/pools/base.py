@@ -1,10 +1,15 @@
 import asyncio
 from functools import cached_property
-from typing import Generic, List, Type, TypeVar
+from typing import TYPE_CHECKING, Generic, List, Optional, Sequence, Type, TypeVar
+
+if TYPE_CHECKING:
+    from ..adaptive import AIMDController
 
 
 class BaseElement:
 
+    __slots__ = ("size", "allocated")
+
     def __init__(self, size: int, allocated: bool):
         self.size = size
         self.allocated = allocated
@@ -15,9 +20,13 @@ class BaseElement:
     async def cleanup(self):
         self.allocated = False
 
+    def release(self):
+        """Give back the resource without cleaning up, e.g. to roll back a gang allocation."""
+        self.allocated = False
+
     def allocate(self):
         """Pre consume the resource."""
-        if self.allocated:
+        if self.is_unavailable():
             return []
         self.allocated = True
         return [self]
@@ -38,6 +47,10 @@ class BaseResources(List[T_co]):
         for res in self:
             await res.cleanup()
 
+    def release(self):
+        for res in self:
+            res.release()
+
     def __hash__(self) -> int:
         return hash(tuple(self))
 
@@ -58,13 +71,30 @@ class BaseAllocator(Generic[T_co]):
         pass
 
     async def _allocate(self, size: int):
+        """Allocate up to `size`."""
         allocated = []
+        total = 0
         for res in self.pool:
-            allocated.extend(res.allocate())
-            if sum(a.size for a in allocated) >= size:
+            for element in res.allocate():
+                allocated.append(element)
+                total += element.size
+            if total >= size:
                 break
         return allocated
 
+    async def _allocate_request(self, size: int, *args, **kwargs):
+        """Allocate up to `size` for a request, given the arguments of `_get_size`. Override it
+        instead of `_allocate` when the allocation depends on the request."""
+        return await self._allocate(size)
+
+    async def try_allocate(self, size: int, *args, **kwargs) -> Optional[BaseResources[T_co]]:
+        """Allocate `size` at once or nothing, without waiting. `_callback` is not called."""
+        allocated = BaseResources[T_co](await self._allocate_request(size, *args, **kwargs))
+        if allocated.size() < size:
+            allocated.release()
+            return None
+        return allocated
+
     async def __call__(self, *args, **kwargs) -> BaseResources[T_co]:
         allocated = BaseResources[T_co]()
         print_after = 5
@@ -72,12 +102,15 @@ class BaseAllocator(Generic[T_co]):
 
         while allocated.size() < (size := await
                                   self._get_size(*args, **kwargs)):
+            allocated.extend(await self._allocate_request(size - allocated.size(), *args,
+                                                          **kwargs))
+            if allocated.size() >= size:
+                break
             if print_after == 0:
                 print(f"Waiting for {size} {self.pool} resources...")
             if print_after >= 0:
                 print_after -= 1
             await asyncio.sleep(interval)
-            allocated.extend(await self._allocate(size))
 
         await self._callback(allocated, *args, **kwargs)
         return allocated
@@ -87,6 +120,7 @@ class BasePool:
 
     element_type: Type[BaseElement] = BaseElement
     pool: List[BaseElement]
+    controllers: Sequence["AIMDController"] = ()
 
     @cached_property
     def allocate(self):
@@ -99,6 +133,15 @@ class BasePool:
     def __iter__(self):
         return iter(self.pool)
 
+    @property
+    def capacity(self):
+        return sum(res.size for res in self.pool)
+
     @property
     def available_size(self):
-        return sum(res.size for res in self.pool if res.is_unavailable())
+        return sum(res.size for res in self.pool if not res.is_unavailable())
+
+    def observe(self, amount: float = 1.0, error: bool = False, latency: Optional[float] = None):
+        """Feed a sample to the controllers attached to the pool, see `AIMDController.record`."""
+        for controller in self.controllers:
+            controller.record(amount, error=error, latency=latency)
@@ -0,0 +1,111 @@
+import inspect
+from collections import deque
+from functools import cached_property
+from typing import Any, Callable, Deque, Optional
+
+from .base import BaseAllocator, BaseElement, BasePool, BaseResources
+
+
+class ConnectionElement(BaseElement):
+    """A slot holding a reusable client, created on first use."""
+
+    __slots__ = ("pool", "client")
+
+    def __init__(self, pool: "ConnectionPool"):
+        super().__init__(1, False)
+        self.pool = pool
+        self.client: Any = None
+
+    async def cleanup(self):
+        # the client is kept open for the next experiment
+        self.release()
+
+    def release(self):
+        if self.allocated:
+            self.allocated = False
+            self.pool.idle.append(self)
+
+    def __repr__(self) -> str:
+        return f"Connection(client={self.client!r}, allocated={self.allocated})"
+
+
+class ConnectionAllocator(BaseAllocator[ConnectionElement]):
+
+    pool: "ConnectionPool"
+
+    async def _allocate(self, size: int):
+        allocated = []
+        while self.pool.idle and len(allocated) < size:
+            element = self.pool.idle.popleft()
+            element.allocated = True
+            allocated.append(element)
+        return allocated
+
+    async def _callback(self, _allocated: BaseResources, size: int):
+        try:
+            for element in _allocated:
+                if element.client is None:
+                    client = self.pool.factory()
+                    if inspect.isawaitable(client):
+                        client = await client
+                    element.client = client
+        except BaseException:
+            # the resources are not returned to the experiment, give the slots back
+            _allocated.release()
+            raise
+
+
+class ConnectionPool(BasePool):
+    """Hand out reusable clients or sessions to experiments instead of building one per row.
+
+    Use `resource = await exp.get(pool.allocate, 1)` and `resource[0].client`. The client is
+    returned to the pool when the experiment finishes.
+
+    Args:
+        factory (`Callable[[], Any]`): Create a client. May be a coroutine function.
+        size (`int`): The maximum number of clients.
+        close (`Optional[Callable[[Any], Any]]`, optional): Close a client in `aclose`. Defaults to calling `client.aclose()` or `client.close()`.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        size: int,
+        close: Optional[Callable[[Any], Any]] = None,
+    ):
+        self.factory = factory
+        self.close = close
+        self.pool = [ConnectionElement(self) for _ in range(size)]
+        self.idle: Deque[ConnectionElement] = deque(self.pool)
+
+    @cached_property
+    def allocate(self):
+        """Connection allocator.
+
+        Args:
+            size: The number of clients."""
+        return ConnectionAllocator(self)
+
+    @property
+    def available_size(self):
+        return len(self.idle)
+
+    async def aclose(self):
+        """Close all the clients created so far."""
+        for element in self.pool:
+            client, element.client = element.client, None
+            if client is None:
+                continue
+            if self.close is not None:
+                closed = self.close(client)
+            elif hasattr(client, "aclose"):
+                closed = client.aclose()
+            elif hasattr(client, "close"):
+                closed = client.close()
+            else:
+                closed = None
+            if inspect.isawaitable(closed):
+                await closed
+
+    def __repr__(self) -> str:
+        return f"ConnectionPool(avai={self.available_size}, size={len(self.pool)})"
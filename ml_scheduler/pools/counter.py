@@ -1,15 +1,87 @@
+from functools import cached_property
 from typing import Optional
 
-from .base import BaseElement, BasePool
+from .base import BaseAllocator, BaseElement, BasePool
+
+
+class CounterElement(BaseElement):
+    """`size` slots taken from a `CounterPool`."""
+
+    __slots__ = ("pool", )
+
+    def __init__(self, size: int, pool: "CounterPool"):
+        super().__init__(size, True)
+        self.pool = pool
+
+    def release(self):
+        if self.allocated:
+            self.allocated = False
+            self.pool.free += self.size
+
+    async def cleanup(self):
+        self.release()
+
+    def __repr__(self) -> str:
+        return f"Counter(size={self.size}, allocated={self.allocated})"
+
+
+class CounterAllocator(BaseAllocator[CounterElement]):
+
+    pool: "CounterPool"
+
+    async def _allocate(self, size: int):
+        # slots are interchangeable, so a running counter is all the bookkeeping needed
+        size = min(size, self.pool.free)
+        if size <= 0:
+            return []
+        self.pool.free -= size
+        return [CounterElement(size, self.pool)]
 
 
 class CounterPool(BasePool):
+    """A pool of `size` interchangeable slots, e.g. API quota or worker tokens.
+
+    Allocating, releasing and checking the availability are O(1) regardless of `size`.
+
+    Args:
+        size (`int`): The number of slots.
+        available (`Optional[int]`, optional): The number of slots available at start. Defaults to `size`.
+    """
 
     def __init__(
         self,
         size: int,
-        available: Optional[int],
+        available: Optional[int] = None,
     ):
-        self.size = size
-        available = available if available is not None else size
-        self.pool = [BaseElement(1, i >= available) for i in range(size)]
+        self._size = size
+        self.free = available if available is not None else size
+        self.pool = []
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @size.setter
+    def size(self, value: int):
+        # resizing keeps the slots in use, `free` may go negative until they are released
+        self.free += value - self._size
+        self._size = value
+
+    @cached_property
+    def allocate(self):
+        """Counter allocator.
+
+        Args:
+            size: The number of slots."""
+        return CounterAllocator(self)
+
+    @property
+    def capacity(self) -> int:
+        return self.size
+
+    @property
+    def available_size(self) -> int:
+        return self.free
+
+    def __repr__(self) -> str:
+        return f"CounterPool(avai={self.free}, size={self.size})"
@@ -0,0 +1,139 @@
+import glob
+import os
+import re
+from functools import cached_property
+from logging import getLogger
+from typing import Dict, List, Optional, Sequence
+
+from .base import BaseAllocator, BaseElement, BasePool
+
+logger = getLogger(__name__)
+
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+)
+
+
+def parse_cpulist(cpulist: str) -> List[int]:
+    """Parse a Linux cpulist, e.g. `"0-3,8-11"`."""
+    cores = []
+    for part in cpulist.strip().split(","):
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        cores.extend(range(int(start), int(end or start) + 1))
+    return cores
+
+
+def numa_nodes() -> Dict[int, List[int]]:
+    """Map NUMA nodes to their cores. All cores are on node 0 if NUMA is unknown."""
+    nodes = {}
+    for path in glob.glob("/sys/devices/system/node/node*/cpulist"):
+        node = int(re.search(r"node(\d+)", path).group(1))
+        with open(path) as f:
+            nodes[node] = parse_cpulist(f.read())
+    if not nodes:
+        nodes[0] = list(range(os.cpu_count() or 1))
+    return nodes
+
+
+def device_node(element: BaseElement) -> Optional[int]:
+    """The NUMA node of a GPU allocated from `CUDAPool`, if known."""
+    try:
+        bus_id = element.device.bus_id().lower()[-12:]
+        with open(f"/sys/bus/pci/devices/{bus_id}/numa_node") as f:
+            node = int(f.read())
+    except (AttributeError, OSError, ValueError):
+        return None
+    return node if node >= 0 else None
+
+
+class CPUElement(BaseElement):
+
+    __slots__ = ("core", "node")
+
+    def __init__(self, core: int, node: int):
+        super().__init__(1, False)
+        self.core = core
+        self.node = node
+
+    def __str__(self) -> str:
+        return str(self.core)
+
+    def __repr__(self) -> str:
+        return f"CPU(core={self.core}, node={self.node}, allocated={self.allocated})"
+
+
+class CPUAllocator(BaseAllocator[CPUElement]):
+
+    pool: "CPUPool"
+
+    async def _get_size(
+        self,
+        size: Optional[int] = None,
+        cuda: Optional[Sequence[BaseElement]] = None,
+        per_gpu: Optional[int] = None,
+    ):
+        if size is None:
+            size = len(cuda or ()) * (per_gpu or self.pool.cores_per_gpu)
+        return size
+
+    async def _allocate_request(
+        self,
+        size: int,
+        _requested: Optional[int] = None,
+        cuda: Optional[Sequence[BaseElement]] = None,
+        per_gpu: Optional[int] = None,
+    ):
+        free: Dict[int, List[CPUElement]] = {}
+        for element in self.pool:
+            if not element.is_unavailable():
+                free.setdefault(element.node, []).append(element)
+
+        # the nodes of the GPUs first, then the nodes with the most free cores
+        preferred = {device_node(gpu) for gpu in cuda or ()}
+        nodes = sorted(free, key=lambda node: (node not in preferred, -len(free[node]), node))
+        allocated = []
+        for node in nodes:
+            for element in free[node][:size - len(allocated)]:
+                allocated.extend(element.allocate())
+            if len(allocated) >= size:
+                break
+        return allocated
+
+
+class CPUPool(BasePool):
+    """Hand out specific CPU cores, keeping each experiment on as few NUMA nodes as possible.
+
+    `exp.run` pins its subprocess to the allocated cores and sets `OMP_NUM_THREADS` and similar
+    variables to the number of cores, unless they are already set in `env`.
+
+    Args:
+        cores (`Optional[List[int]]`, optional): The cores to hand out. Defaults to the cores this process may run on.
+        cores_per_gpu (`int`, optional): The number of cores per GPU when sized by `cuda`. Defaults to 4.
+    """
+
+    def __init__(self, cores: Optional[List[int]] = None, cores_per_gpu: int = 4):
+        if cores is None:
+            cores = sorted(os.sched_getaffinity(0)) if hasattr(
+                os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        node_of = {core: node for node, node_cores in numa_nodes().items() for core in node_cores}
+        self.cores_per_gpu = cores_per_gpu
+        self.pool = [CPUElement(core, node_of.get(core, 0)) for core in cores]
+
+    @cached_property
+    def allocate(self):
+        """CPU allocator.
+
+        Args:
+            size: The number of cores. Defaults to `per_gpu` cores per GPU in `cuda`.
+            cuda: The GPUs allocated alongside, to size the request and pick their NUMA nodes.
+            per_gpu: The number of cores per GPU. Defaults to `cores_per_gpu` of the pool."""
+        return CPUAllocator(self)
+
+    def __repr__(self) -> str:
+        return f"CPUPool(avai={self.available_size})"
@@ -8,6 +8,8 @@ from .base import BaseAllocator, BaseElement, BasePool
 
 class CUDAElement(BaseElement):
 
+    __slots__ = ("device", "min_memory", "cuda_index")
+
     def __init__(self, device: Device, min_memory: float = 90):
         super().__init__(1, False)
         self.device = device
@@ -15,8 +17,9 @@ class CUDAElement(BaseElement):
         self.cuda_index = device.cuda_index
 
     def is_unavailable(self):
+        # `min_memory` is the percent of free memory required
         return (100 - self.device.memory_percent()
-                ) > self.min_memory or self.is_allocated()
+                ) < self.min_memory or self.is_allocated()
 
     def __str__(self) -> str:
         return str(self.cuda_index)
@@ -28,11 +31,32 @@ class CUDAElement(BaseElement):
 
 
 class CUDAPool(BasePool):
+    """Hand out GPUs with enough free memory.
+
+    Args:
+        ids (`List[int]`): The CUDA indices of the GPUs.
+        min_memory (`float`, optional): The percent of free memory a GPU needs to be allocated. Defaults to 20.
+    """
 
     def __init__(self, ids: List[int], min_memory: float = 20):
         devices = Device.cuda.all()
         devices = {d.cuda_index: d for d in devices}
         self.pool = [CUDAElement(devices[id], min_memory) for id in ids]
+        self._min_memory = min_memory
+
+    @property
+    def min_memory(self) -> float:
+        return self._min_memory
+
+    @min_memory.setter
+    def min_memory(self, value: float):
+        self._min_memory = value
+        for element in self.pool:
+            element.min_memory = value
+
+    def memory_headroom(self) -> float:
+        """The lowest free memory percent across the devices."""
+        return min(100 - element.device.memory_percent() for element in self.pool)
 
     @cached_property
     def allocate(self):
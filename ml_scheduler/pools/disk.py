@@ -1,22 +1,32 @@
 import asyncio
-import os
 import shutil
+import time
 from functools import cached_property
 from logging import getLogger
 from pathlib import Path
-from typing import List, Literal, Optional
+from typing import Dict, List, Literal, Optional, Union
 
 import psutil
 
-from ..threads import to_thread
+from ..threads import run_in_executor
 from .base import BaseAllocator, BaseElement, BasePool, BaseResources
+from .manifest import FileEntry, ManifestCache
+from .sources import CopySource, as_source
 
 logger = getLogger(__name__)
 
 
 class DiskElement(BaseElement):
 
-    def __init__(self, size: int, source_folder: str, target_folder: str,
+    __slots__ = (
+        "source_folder",
+        "target_folder",
+        "cleanup_target",
+        "disk_allocator",
+        "reserved",
+    )
+
+    def __init__(self, size: int, source_folder: Optional[str], target_folder: Optional[str],
                  cleanup_target: bool, disk_allocator: "DiskAllocator"):
         self.size = size
         self.source_folder = source_folder
@@ -24,105 +34,116 @@ class DiskElement(BaseElement):
         self.cleanup_target = cleanup_target
         self.disk_allocator = disk_allocator
         self.allocated = True
+        # the size is counted in `pre_allocated` until the files are on the disk
+        self.reserved = True
 
-    async def cleanup(self):
+    def commit(self):
+        """The files are on the disk and counted by `psutil.disk_usage`."""
+        if self.reserved:
+            self.reserved = False
+            self.disk_allocator.pool.pre_allocated -= self.size
+
+    def release(self):
+        self.commit()
         self.allocated = False
-        if self.cleanup_target:
+
+    async def cleanup(self):
+        self.release()
+        if self.cleanup_target and self.target_folder is not None:
             logger.info(f"Cleaning up {self.target_folder}")
-            await to_thread(shutil.rmtree, self.disk_allocator.target_folder)
+            await run_in_executor("metadata", shutil.rmtree, self.target_folder, ignore_errors=True)
+            self.disk_allocator.pool.manifests.invalidate(self.target_folder)
 
 
 class DiskAllocator(BaseAllocator[DiskElement]):
 
     pool: "DiskPool"
-    source_folder: str
-    target_folder: str
-    cleanup_target: bool = True
 
-    async def _allocate(self, size: int):
+    def _reserve(self, size: int, source_folder: Union[str, CopySource, None],
+                 target_folder: Optional[str], cleanup_target: bool):
         if size > self.pool.available_size:
             return []
 
         self.pool.pre_allocated += size
-        return [
-            DiskElement(size, self.source_folder, self.target_folder,
-                        self.cleanup_target, self)
-        ]
+        return [DiskElement(size, source_folder, target_folder, cleanup_target, self)]
+
+    async def _allocate(self, size: int):
+        return self._reserve(size, None, None, False)
 
 
 class CopyAllocator(DiskAllocator):
 
-    def __init__(self, pool, unit, max_copys=2):
+    def __init__(self, pool, unit):
         super().__init__(pool)
         self.in_copy = 0
-        self.max_copys = max_copys
         self.unit = unit
 
+    @property
+    def max_copys(self) -> int:
+        # read from the pool, which may be tuned at runtime
+        return self.pool.max_copys
+
+    async def _pending(
+        self,
+        source_folder: Union[str, CopySource],
+        target_folder: str,
+        files: Optional[List[str]] = None,
+    ) -> Dict[str, FileEntry]:
+        """The files of the source missing in the target or of a different size."""
+        source = await as_source(source_folder).manifest(self.pool.manifests)
+        target = await self.pool.manifests.get(target_folder)
+        return {
+            f: entry
+            for f, entry in source.select(files).items()
+            if f not in target.files or target.files[f].size != entry.size
+        }
+
     async def _callback(
         self,
         _allocated: BaseResources,
-        source_folder: str,
+        source_folder: Union[str, CopySource],
         target_folder: str,
         files: Optional[List[str]] = None,
         cleanup_target: bool = True,
     ):
-
-        def copy_files(
-            source_dir: Path,
-            target_dir: Path,
-            files: Optional[List[str]] = None,
-        ):
-            for f in files:
-                if not (target_dir / f).exists() or (
-                        source_dir / f).stat().st_size != (target_dir /
-                                                           f).stat().st_size:
-                    src = (source_dir / f).as_posix()
-                    tgt = (target_dir / f).as_posix()
-                    shutil.copyfile(src, tgt)
-
-        self.source_folder = source_folder
-        self.target_folder = target_folder
-        self.cleanup_target = cleanup_target
-        source_dir = Path(source_folder)
-        target_dir = Path(target_folder)
-        if files is None:
-            files = [
-                f for f in os.listdir(source_folder)
-                if os.path.isfile(source_dir / f)
-            ]
-
         while self.in_copy >= self.max_copys:
             await asyncio.sleep(1)
 
         self.in_copy += 1
-        await to_thread(copy_files, source_dir, target_dir, files)
-        self.pool.pre_allocated -= _allocated.size()
-        self.in_copy -= 1
+        start = time.monotonic()
+        try:
+            pending = await self._pending(source_folder, target_folder, files)
+            copied = await as_source(source_folder).fetch(pending, Path(target_folder))
+        except Exception:
+            self.pool.observe(0, error=True)
+            raise
+        finally:
+            self.in_copy -= 1
+            self.pool.manifests.invalidate(target_folder)
+        self.pool.observe(copied, latency=time.monotonic() - start)
+        for element in _allocated:
+            element.commit()
 
     async def _get_size(
         self,
-        source_folder: str,
+        source_folder: Union[str, CopySource],
         target_folder: str,
         files: Optional[List[str]] = None,
         cleanup_target: bool = True,
     ):
-        source_dir = Path(source_folder)
-        if files is None:
-            files = [
-                f for f in os.listdir(source_folder)
-                if os.path.isfile(source_dir / f)
-            ]
+        # called on every wait of the allocator: the manifests are cached and scanned off the loop
+        pending = await self._pending(source_folder, target_folder, files)
+        return sum(entry.size for entry in pending.values()) // self.unit
 
-        size = sum((source_dir / f).stat().st_size for f in files) // self.unit
-
-        target_dir = Path(target_folder)
-        if not target_dir.exists():
-            target_dir.mkdir(parents=True, exist_ok=True)
-        else:
-            size -= sum(
-                (target_dir / f).stat().st_size
-                for f in files if (target_dir / f).exists()) // self.unit
-        return size
+    async def _allocate_request(
+        self,
+        size: int,
+        source_folder: Union[str, CopySource],
+        target_folder: str,
+        files: Optional[List[str]] = None,
+        cleanup_target: bool = True,
+    ):
+        return self._reserve(size, source_folder, target_folder, cleanup_target)
 
 
 class DiskPool(BasePool):
@@ -134,12 +155,14 @@ class DiskPool(BasePool):
         path: str,
         unit: Literal['GB', 'MB'] = 'GB',
         max_copys: int = 2,
+        scan_parallel: int = 8,
     ):
         self.path = path
         self.unit = self.unit_mapping[unit]
         self.pre_allocated = 0
         self.callback_count = 0
         self.max_copys = max_copys
+        self.manifests = ManifestCache(scan_parallel)
 
     @cached_property
     def allocate(self):
@@ -150,14 +173,22 @@ class DiskPool(BasePool):
         """Base allocator.
 
         Args:
-            source_folder: Source folder to copy files from.
+            source_folder: Source folder to copy files from, or a `CopySource` such as
+                `S3Source` or `RsyncSource`.
             target_folder: Target folder to copy files to.
-            files: List of files to copy. If None, all files in source_folder
-                will be copied.
+            files: List of files to copy, relative to source_folder. If None, all files under
+                source_folder, including nested folders, will be copied.
         """
-        return CopyAllocator(self, max_copys=self.max_copys, unit=self.unit)
+        return CopyAllocator(self, unit=self.unit)
+
+    @property
+    def capacity(self) -> int:
+        return psutil.disk_usage(self.path).total // self.unit
 
     @property
     def available_size(self) -> int:
         return psutil.disk_usage(
             self.path).free // self.unit - self.pre_allocated
+
+    def __repr__(self) -> str:
+        return f"DiskPool(avai={self.available_size}, max_copys={self.max_copys})"
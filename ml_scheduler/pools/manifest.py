@@ -0,0 +1,119 @@
+"""File manifests of copy sources and targets, scanned off the event loop and cached"""
+
+import asyncio
+import os
+from logging import getLogger
+from typing import AbstractSet, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from ..threads import run_in_executor
+
+logger = getLogger(__name__)
+
+
+class FileEntry(NamedTuple):
+    size: int
+    mtime_ns: int
+
+
+class Manifest(NamedTuple):
+    """The files under `root`, keyed by their relative posix path, and the mtimes of the scanned
+    directories used to tell whether the manifest is still valid."""
+
+    root: str
+    files: Dict[str, FileEntry]
+    dirs: Dict[str, int]
+
+    def select(self, files: Optional[Iterable[str]] = None) -> Dict[str, FileEntry]:
+        """The entries of `files`, or all of them. Raise `FileNotFoundError` for missing files."""
+        if files is None:
+            return self.files
+        selected = {}
+        for f in files:
+            f = f.replace(os.sep, "/")
+            if f not in self.files:
+                raise FileNotFoundError(os.path.join(self.root, f))
+            selected[f] = self.files[f]
+        return selected
+
+    def total_size(self, files: Optional[Iterable[str]] = None) -> int:
+        return sum(entry.size for entry in self.select(files).values())
+
+
+def _scan_dir(root: str, rel: str) -> Tuple[Tuple[int, int], int, Dict[str, FileEntry], List[str]]:
+    path = os.path.join(root, rel) if rel else root
+    files, subdirs = {}, []
+    dir_stat = os.stat(path)
+    with os.scandir(path) as it:
+        for entry in it:
+            name = f"{rel}/{entry.name}" if rel else entry.name
+            if entry.is_dir():
+                subdirs.append(name)
+            elif entry.is_file():
+                stat = entry.stat()
+                files[name] = FileEntry(stat.st_size, stat.st_mtime_ns)
+    return (dir_stat.st_dev, dir_stat.st_ino), dir_stat.st_mtime_ns, files, subdirs
+
+
+async def scan(root: str, parallel: int = 8) -> Manifest:
+    """List the files under `root` recursively, scanning up to `parallel` directories at once in
+    the `"metadata"` executor. An empty manifest is returned if `root` does not exist.
+
+    Symlinked directories are followed, except into one of their own parents."""
+    semaphore = asyncio.Semaphore(parallel)
+    files: Dict[str, FileEntry] = {}
+    dirs: Dict[str, int] = {}
+
+    async def walk(rel: str, parents: AbstractSet[Tuple[int, int]]):
+        async with semaphore:
+            try:
+                inode, mtime_ns, entries, subdirs = await run_in_executor(
+                    "metadata", _scan_dir, root, rel)
+            except FileNotFoundError:
+                return
+        if inode in parents:
+            # a symlink loop
+            logger.debug(f"Not following {os.path.join(root, rel)} into its own parent")
+            return
+        dirs[rel] = mtime_ns
+        files.update(entries)
+        parents = parents | {inode}
+        await asyncio.gather(*(walk(subdir, parents) for subdir in subdirs))
+
+    await walk("", frozenset())
+    return Manifest(root, files, dirs)
+
+
+def _changed(manifest: Manifest) -> bool:
+    for rel, mtime_ns in manifest.dirs.items():
+        try:
+            if os.stat(os.path.join(manifest.root, rel)).st_mtime_ns != mtime_ns:
+                return True
+        except FileNotFoundError:
+            return True
+    # the root was missing when scanned
+    return not manifest.dirs and os.path.exists(manifest.root)
+
+
+class ManifestCache:
+    """Cache manifests by folder, invalidated when the mtime of a scanned directory changes.
+
+    Adding, removing or renaming files changes the mtime of their directory, but rewriting a file
+    in place does not: call `invalidate` after writing to a folder.
+
+    Args:
+        parallel (`int`, optional): The number of directories scanned at once. Defaults to 8.
+    """
+
+    def __init__(self, parallel: int = 8):
+        self.parallel = parallel
+        self.manifests: Dict[str, Manifest] = {}
+
+    async def get(self, root: str) -> Manifest:
+        root = os.path.abspath(root)
+        manifest = self.manifests.get(root)
+        if manifest is None or await run_in_executor("metadata", _changed, manifest):
+            manifest = self.manifests[root] = await scan(root, self.parallel)
+        return manifest
+
+    def invalidate(self, root: str):
+        self.manifests.pop(os.path.abspath(root), None)
@@ -0,0 +1,74 @@
+from functools import cached_property
+from typing import Literal
+
+import psutil
+
+from .base import BaseAllocator, BaseElement, BasePool
+
+
+class MemoryElement(BaseElement):
+
+    __slots__ = ("pool", )
+
+    def __init__(self, size: int, pool: "MemoryPool"):
+        super().__init__(size, True)
+        self.pool = pool
+
+    def release(self):
+        if self.allocated:
+            self.allocated = False
+            self.pool.reserved -= self.size
+
+    async def cleanup(self):
+        self.release()
+
+
+class MemoryAllocator(BaseAllocator[MemoryElement]):
+
+    pool: "MemoryPool"
+
+    async def _allocate(self, size: int):
+        if size > self.pool.available_size:
+            return []
+
+        self.pool.reserved += size
+        return [MemoryElement(size, self.pool)]
+
+
+class MemoryPool(BasePool):
+    """Reserve host RAM against `psutil.virtual_memory`.
+
+    Args:
+        unit (`Literal['GB', 'MB']`, optional): The unit of sizes. Defaults to `'GB'`.
+        headroom (`int`, optional): Memory never reserved, e.g. for the OS and page cache. Defaults to 0.
+    """
+
+    unit_mapping = {'GB': 1_000_000_000, 'MB': 1_000_000}
+
+    def __init__(self, unit: Literal['GB', 'MB'] = 'GB', headroom: int = 0):
+        self.unit = self.unit_mapping[unit]
+        self.headroom = headroom
+        self.reserved = 0
+        self.pool = []
+
+    @cached_property
+    def allocate(self):
+        """Memory allocator.
+
+        Args:
+            size: The memory to reserve."""
+        return MemoryAllocator(self)
+
+    @property
+    def capacity(self) -> int:
+        return psutil.virtual_memory().total // self.unit - self.headroom
+
+    @property
+    def available_size(self) -> int:
+        memory = psutil.virtual_memory()
+        # reservations not used yet are not reflected in `memory.available`
+        return min(memory.total // self.unit - self.reserved,
+                   memory.available // self.unit) - self.headroom
+
+    def __repr__(self) -> str:
+        return f"MemoryPool(avai={self.available_size}, reserved={self.reserved})"
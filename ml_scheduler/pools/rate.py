@@ -0,0 +1,164 @@
+import asyncio
+import time
+from functools import cached_property
+from typing import Dict, Hashable, Optional
+
+from .base import BaseAllocator, BaseElement, BasePool, BaseResources
+
+
+class TokenElement(BaseElement):
+    """Tokens taken from a bucket. Used tokens refill over time instead of being given back,
+    but tokens released unused, e.g. when a gang allocation is rolled back, are returned."""
+
+    __slots__ = ("key", "bucket")
+
+    def __init__(self, size: int, key: Optional[Hashable], bucket: "TokenBucket"):
+        super().__init__(size, True)
+        self.key = key
+        self.bucket = bucket
+
+    def release(self):
+        if self.allocated:
+            self.allocated = False
+            self.bucket.give_back(self.size, time.monotonic())
+
+    def __repr__(self) -> str:
+        return f"Tokens(size={self.size}, key={self.key})"
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float, burst: float):
+        self.nominal_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def give_back(self, size: int, now: float):
+        self.refill(now)
+        self.tokens = min(self.burst, self.tokens + size)
+
+    def wait_time(self, size: int, now: float) -> float:
+        """Seconds to wait before `size` tokens are available."""
+        self.refill(now)
+        if now < self.paused_until:
+            return self.paused_until - now
+        return max(0.0, (size - self.tokens) / self.rate)
+
+    def __repr__(self) -> str:
+        return f"TokenBucket(rate={self.rate:.3g}/s, tokens={self.tokens:.3g}/{self.burst})"
+
+
+class RateAllocator(BaseAllocator[TokenElement]):
+
+    pool: "RatePool"
+
+    async def _get_size(self, size: int = 1, key: Optional[Hashable] = None):
+        return size
+
+    async def _allocate_request(
+        self,
+        size: int,
+        _requested: int = 1,
+        key: Optional[Hashable] = None,
+    ):
+        bucket = self.pool.bucket(key)
+        if bucket.wait_time(size, time.monotonic()) > 0:
+            return []
+        self.pool._take(bucket, size)
+        return [TokenElement(size, key, bucket)]
+
+    async def __call__(self, size: int = 1, key: Optional[Hashable] = None):
+        bucket = self.pool.bucket(key)
+        if size > bucket.burst:
+            raise ValueError(f"Cannot take {size} tokens at once from {bucket}")
+
+        # sleep exactly until the tokens are refilled instead of polling
+        while (delay := bucket.wait_time(size, time.monotonic())) > 0:
+            await asyncio.sleep(delay)
+        self.pool._take(bucket, size)
+        return BaseResources[TokenElement]([TokenElement(size, key, bucket)])
+
+
+class RatePool(BasePool):
+    """Token-bucket rate limiter for API or IO bound experiments.
+
+    Each `key` (e.g. a host name) has its own bucket refilled at `rate` tokens per `period`,
+    holding at most `burst` tokens. Call `throttled` on 429-style responses to back off: the rate
+    of the key is reduced and recovers gradually with each successful request.
+
+    Args:
+        rate (`float`): The number of tokens per period.
+        period (`float`, optional): The period in seconds. Defaults to 1.
+        burst (`Optional[float]`, optional): The bucket size. Defaults to `rate`.
+        key_rates (`Optional[Dict[Hashable, float]]`, optional): The rates of specific keys, in tokens per period.
+        backoff (`float`, optional): Multiply the rate by this when throttled. Defaults to 0.5.
+        recovery (`float`, optional): Fraction of the nominal rate recovered per successful request. Defaults to 0.05.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        period: float = 1.0,
+        burst: Optional[float] = None,
+        key_rates: Optional[Dict[Hashable, float]] = None,
+        backoff: float = 0.5,
+        recovery: float = 0.05,
+    ):
+        self.rate = rate / period
+        self.period = period
+        self.burst = burst if burst is not None else max(rate, 1)
+        self.key_rates = {key: r / period for key, r in (key_rates or {}).items()}
+        self.backoff = backoff
+        self.recovery = recovery
+        self.buckets: Dict[Optional[Hashable], TokenBucket] = {}
+        self.pool = []
+
+    def bucket(self, key: Optional[Hashable] = None) -> TokenBucket:
+        if key not in self.buckets:
+            rate = self.key_rates.get(key, self.rate)
+            self.buckets[key] = TokenBucket(rate, self.burst)
+        return self.buckets[key]
+
+    def _take(self, bucket: TokenBucket, size: int):
+        bucket.tokens -= size
+        if bucket.rate < bucket.nominal_rate:
+            recovered = bucket.rate + bucket.nominal_rate * self.recovery
+            bucket.rate = min(bucket.nominal_rate, recovered)
+
+    def throttled(self, key: Optional[Hashable] = None, retry_after: Optional[float] = None):
+        """Back off after a 429-style signal of `key`, pausing for `retry_after` seconds if given."""
+        bucket = self.bucket(key)
+        now = time.monotonic()
+        bucket.refill(now)
+        bucket.rate = max(bucket.nominal_rate * 0.01, bucket.rate * self.backoff)
+        bucket.tokens = min(bucket.tokens, 0)
+        bucket.paused_until = max(bucket.paused_until, now + (retry_after or 1 / bucket.rate))
+
+    @cached_property
+    def allocate(self):
+        """Rate limiter.
+
+        Args:
+            size: The number of tokens to take. Defaults to 1.
+            key: The bucket to take the tokens from. Defaults to the shared bucket."""
+        return RateAllocator(self)
+
+    @property
+    def capacity(self):
+        return self.burst
+
+    @property
+    def available_size(self):
+        bucket = self.bucket()
+        bucket.refill(time.monotonic())
+        return int(bucket.tokens)
+
+    def __repr__(self) -> str:
+        return f"RatePool(rate={self.rate:.3g}/s, buckets={len(self.buckets)})"
@@ -0,0 +1,406 @@
+"""Sources `DiskPool.copy_folder` copies from: local folders, S3-compatible object storage and
+rsync over ssh"""
+
+import asyncio
+import hashlib
+import hmac
+import os
+import re
+import shutil
+import subprocess
+import time
+from datetime import datetime, timezone
+from logging import getLogger
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple, Union
+from urllib.parse import quote, urlsplit
+
+from ..threads import run_in_executor
+from .manifest import FileEntry, Manifest, ManifestCache
+
+logger = getLogger(__name__)
+
+
+class CopySource:
+    """Where `DiskPool.copy_folder` copies from.
+
+    A source lists its files in a `Manifest`, used to size the copy against the free space of the
+    pool, and fetches the files missing in the target folder.
+    """
+
+    async def manifest(self, cache: ManifestCache) -> Manifest:
+        """List the files of the source."""
+        raise NotImplementedError
+
+    async def fetch(self, files: Dict[str, FileEntry], target_dir: Path) -> int:
+        """Copy `files` to `target_dir` and return the number of bytes copied."""
+        raise NotImplementedError
+
+
+def _copy_files(source_dir: Path, target_dir: Path, files: Dict[str, FileEntry]) -> int:
+    copied = 0
+    for f, entry in files.items():
+        (target_dir / f).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(source_dir / f, target_dir / f)
+        copied += entry.size
+    return copied
+
+
+class LocalSource(CopySource):
+    """A folder on a mounted file system, e.g. NFS.
+
+    Args:
+        path (`str`): The folder to copy from.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    async def manifest(self, cache: ManifestCache) -> Manifest:
+        return await cache.get(self.path)
+
+    async def fetch(self, files: Dict[str, FileEntry], target_dir: Path) -> int:
+        return await run_in_executor("copy", _copy_files, Path(self.path), target_dir, files)
+
+    def __str__(self) -> str:
+        return self.path
+
+    def __repr__(self) -> str:
+        return f"LocalSource({self.path!r})"
+
+
+def as_source(source: Union[str, os.PathLike, CopySource]) -> CopySource:
+    """A plain path is a `LocalSource`."""
+    if isinstance(source, CopySource):
+        return source
+    return LocalSource(os.fspath(source))
+
+
+class _CachedListing(CopySource):
+    """Remote listings are cached for `ttl` seconds, since sizing runs on every wait."""
+
+    ttl: float
+    root: str
+    _manifest: Optional[Manifest] = None
+    _listed_at = 0.0
+
+    def _list(self) -> Manifest:
+        raise NotImplementedError
+
+    async def manifest(self, cache: ManifestCache) -> Manifest:
+        if self._manifest is None or time.monotonic() - self._listed_at > self.ttl:
+            self._manifest = await run_in_executor("metadata", self._list)
+            self._listed_at = time.monotonic()
+        return self._manifest
+
+
+EMPTY_SHA256 = hashlib.sha256(b"").hexdigest()
+
+
+def _hmac(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode(), hashlib.sha256).digest()
+
+
+def _query(query: Dict[str, str]) -> str:
+    return "&".join(f"{quote(k, safe='-_.~')}={quote(v, safe='-_.~')}"
+                    for k, v in sorted(query.items()))
+
+
+def _parse_time(value: str) -> int:
+    value = value.replace("Z", "+00:00")
+    return int(datetime.fromisoformat(value).timestamp() * 1e9)
+
+
+def _is_relative(name: str) -> bool:
+    """Whether `name` is a plain relative path, which cannot escape the target folder."""
+    return not name.startswith("/") and all(part not in ("", ".", "..")
+                                            for part in name.split("/"))
+
+
+def _preallocate(path: Path, size: int):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.truncate(size)
+
+
+class S3Source(_CachedListing):
+    """A prefix of a bucket in S3-compatible object storage (AWS S3, MinIO, Ceph...), fetched
+    over HTTP with parallel ranged GETs.
+
+    Requests are signed with AWS Signature Version 4 when `access_key` is given, and anonymous
+    otherwise. Every file is written to a `.part` file, checked against the size of the listing
+    and, for objects uploaded in a single part, against the MD5 ETag, then renamed. The number of
+    parts downloaded at once is also bounded by the `"copy"` executor.
+
+    Example:
+        `disk.copy_folder, S3Source("http://minio:9000", "ckpt", "llama-7b/"), "/ssd/llama-7b"`
+
+    Args:
+        endpoint (`str`): The URL of the service, e.g. `"https://s3.us-east-1.amazonaws.com"`.
+        bucket (`str`): The bucket. Path-style URLs are used.
+        prefix (`str`, optional): The folder of the keys to copy, with or without a trailing slash. Defaults to the whole bucket.
+        access_key (`Optional[str]`, optional): Defaults to `AWS_ACCESS_KEY_ID`.
+        secret_key (`Optional[str]`, optional): Defaults to `AWS_SECRET_ACCESS_KEY`.
+        session_token (`Optional[str]`, optional): Defaults to `AWS_SESSION_TOKEN`.
+        region (`str`, optional): The region used to sign requests. Defaults to `AWS_REGION` or `"us-east-1"`.
+        part_size (`int`, optional): The bytes of a ranged GET. Defaults to 64 MiB.
+        parallel (`int`, optional): The number of parts downloaded at once. Defaults to 8.
+        retries (`int`, optional): The attempts of each part. Defaults to 3.
+        verify (`bool`, optional): Check sizes and single-part ETags. Defaults to True.
+        timeout (`float`, optional): Seconds before a request times out. Defaults to 60.
+        ttl (`float`, optional): Seconds a listing is reused. Defaults to 60.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        bucket: str,
+        prefix: str = "",
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        session_token: Optional[str] = None,
+        region: Optional[str] = None,
+        part_size: int = 64 * 1024 * 1024,
+        parallel: int = 8,
+        retries: int = 3,
+        verify: bool = True,
+        timeout: float = 60.0,
+        ttl: float = 60.0,
+    ):
+        self.endpoint = endpoint.rstrip("/")
+        self.bucket = bucket
+        # a folder: `ckpt/m` must not list `ckpt/m-chat/...`
+        prefix = prefix.rstrip("/")
+        self.prefix = prefix + "/" if prefix else ""
+        self.access_key = access_key or os.environ.get("AWS_ACCESS_KEY_ID")
+        self.secret_key = secret_key or os.environ.get("AWS_SECRET_ACCESS_KEY")
+        self.session_token = session_token or os.environ.get("AWS_SESSION_TOKEN")
+        self.region = region or os.environ.get("AWS_REGION", "us-east-1")
+        self.part_size = part_size
+        self.parallel = parallel
+        self.retries = retries
+        self.verify = verify
+        self.timeout = timeout
+        self.ttl = ttl
+        self.root = f"{self.endpoint}/{bucket}/{self.prefix}"
+        self.etags: Dict[str, str] = {}
+
+    def _headers(self, path: str, query: Dict[str, str]) -> Dict[str, str]:
+        """Sign a GET request with AWS Signature Version 4."""
+        host = urlsplit(self.endpoint).netloc
+        if not self.access_key or not self.secret_key:
+            return {"Host": host}
+
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date = amz_date[:8]
+        headers = {"host": host, "x-amz-content-sha256": EMPTY_SHA256, "x-amz-date": amz_date}
+        if self.session_token:
+            headers["x-amz-security-token"] = self.session_token
+        signed_headers = ";".join(sorted(headers))
+        canonical_request = "\n".join([
+            "GET",
+            quote(path, safe="/-_.~"),
+            _query(query),
+            "".join(f"{k}:{headers[k]}\n" for k in sorted(headers)),
+            signed_headers,
+            EMPTY_SHA256,
+        ])
+        scope = f"{date}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256",
+            amz_date,
+            scope,
+            hashlib.sha256(canonical_request.encode()).hexdigest(),
+        ])
+        key = _hmac(("AWS4" + self.secret_key).encode(), date)
+        for part in (self.region, "s3", "aws4_request"):
+            key = _hmac(key, part)
+        signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+        headers["Authorization"] = (f"AWS4-HMAC-SHA256 Credential={self.access_key}/{scope}, "
+                                    f"SignedHeaders={signed_headers}, Signature={signature}")
+        return headers
+
+    def _get(self, key: Optional[str] = None, query: Optional[Dict[str, str]] = None,
+             headers: Optional[Dict[str, str]] = None):
+        # imported here, `http.client` pulls in `ssl`
+        from urllib.request import Request, urlopen
+
+        query = query or {}
+        endpoint = urlsplit(self.endpoint)
+        path = f"{endpoint.path}/{self.bucket}" + (f"/{key}" if key is not None else "")
+        url = f"{endpoint.scheme}://{endpoint.netloc}{quote(path, safe='/-_.~')}"
+        if query:
+            url += "?" + _query(query)
+        request = Request(url, headers={**self._headers(path, query), **(headers or {})})
+        return urlopen(request, timeout=self.timeout)
+
+    def _list(self) -> Manifest:
+        import xml.etree.ElementTree as ET
+
+        files: Dict[str, FileEntry] = {}
+        etags: Dict[str, str] = {}
+        query = {"list-type": "2", "prefix": self.prefix}
+        while True:
+            with self._get(query=query) as response:
+                root = ET.fromstring(response.read())
+            for content in root.iterfind("{*}Contents"):
+                key = content.findtext("{*}Key")
+                name = key[len(self.prefix):]
+                if not name or name.endswith("/"):
+                    continue
+                if not _is_relative(name):
+                    # e.g. `prefix//etc/x` or `prefix/../x` would be written outside the target
+                    logger.warning(f"Skipping {key!r} of {self.root}, not a relative path")
+                    continue
+                files[name] = FileEntry(int(content.findtext("{*}Size")),
+                                        _parse_time(content.findtext("{*}LastModified")))
+                etags[name] = (content.findtext("{*}ETag") or "").strip('"')
+            token = root.findtext("{*}NextContinuationToken")
+            if root.findtext("{*}IsTruncated") != "true" or not token:
+                break
+            query = {**query, "continuation-token": token}
+        self.etags = etags
+        return Manifest(self.root, files, {})
+
+    def _key(self, name: str) -> str:
+        return self.prefix + name
+
+    def _get_range(self, name: str, path: Path, start: int, end: int):
+        """Write the bytes `start` to `end` (inclusive) of `name` at the same offset of `path`."""
+        with self._get(self._key(name), headers={"Range": f"bytes={start}-{end}"}) as response:
+            if response.status != 206 and start != 0:
+                raise IOError(f"{self.endpoint} ignored the range of {name}")
+            written = 0
+            with open(path, "r+b") as f:
+                f.seek(start)
+                while chunk := response.read(1024 * 1024):
+                    f.write(chunk)
+                    written += len(chunk)
+                    if written > end - start + 1:
+                        raise IOError(f"{self.endpoint} ignored the range of {name}")
+        if written != end - start + 1:
+            raise IOError(f"Got {written} of {end - start + 1} bytes of {name}")
+
+    def _check(self, name: str, path: Path, entry: FileEntry):
+        size = path.stat().st_size
+        if size != entry.size:
+            raise IOError(f"Size mismatch of {name}: {size} != {entry.size}")
+        etag = self.etags.get(name, "")
+        # multipart ETags (`<md5>-<parts>`) depend on the part size of the upload
+        if re.fullmatch(r"[0-9a-f]{32}", etag):
+            md5 = hashlib.md5()
+            with open(path, "rb") as f:
+                while chunk := f.read(1024 * 1024):
+                    md5.update(chunk)
+            if md5.hexdigest() != etag:
+                raise IOError(f"Checksum mismatch of {name}: {md5.hexdigest()} != {etag}")
+
+    async def fetch(self, files: Dict[str, FileEntry], target_dir: Path) -> int:
+        semaphore = asyncio.Semaphore(self.parallel)
+
+        async def get_part(name: str, path: Path, start: int, end: int):
+            async with semaphore:
+                for attempt in range(1, self.retries + 1):
+                    try:
+                        return await run_in_executor("copy", self._get_range, name, path, start,
+                                                     end)
+                    except OSError as e:
+                        if attempt == self.retries:
+                            raise
+                        logger.warning(f"Error fetching {name} [{start}-{end}]: {e}, retrying")
+                        await asyncio.sleep(2**attempt)
+
+        async def get_file(name: str, entry: FileEntry):
+            if not _is_relative(name):
+                raise ValueError(f"Refusing to write {name!r} outside {target_dir}")
+            path = target_dir / name
+            part = path.with_name(path.name + ".part")
+            await run_in_executor("metadata", _preallocate, part, entry.size)
+            try:
+                await asyncio.gather(*(get_part(name, part, start,
+                                                min(start + self.part_size, entry.size) - 1)
+                                       for start in range(0, entry.size, self.part_size)))
+                if self.verify:
+                    await run_in_executor("copy", self._check, name, part, entry)
+                os.replace(part, path)
+            except BaseException:
+                part.unlink(missing_ok=True)
+                raise
+
+        await asyncio.gather(*(get_file(name, entry) for name, entry in files.items()))
+        return sum(entry.size for entry in files.values())
+
+    def __str__(self) -> str:
+        return self.root
+
+    def __repr__(self) -> str:
+        return f"S3Source({self.root!r})"
+
+
+_RSYNC_LINE = re.compile(r"^(\S+)\s+([\d,.]+)\s+(\S+ \S+)\s+(.*)$")
+
+
+class RsyncSource(_CachedListing):
+    """A remote folder fetched with `rsync`, e.g. over ssh. rsync checks each transferred file.
+
+    Example:
+        `disk.copy_folder, RsyncSource("gpu-01:/ckpt/llama-7b", rsh="ssh -p 2222"), "/ssd/llama-7b"`
+
+    Args:
+        remote (`str`): The remote folder, e.g. `"host:/path"` or `"rsync://host/module/path"`.
+        rsh (`Optional[str]`, optional): The remote shell, e.g. `"ssh -i key"`. Defaults to rsync's default.
+        options (`Sequence[str]`, optional): Extra options of `rsync`. Defaults to `("--partial",)`.
+        ttl (`float`, optional): Seconds a listing is reused. Defaults to 60.
+    """
+
+    def __init__(
+        self,
+        remote: str,
+        rsh: Optional[str] = None,
+        options: Sequence[str] = ("--partial", ),
+        ttl: float = 60.0,
+    ):
+        self.remote = remote.rstrip("/") + "/"
+        self.rsh = rsh
+        self.options = list(options)
+        self.ttl = ttl
+        self.root = self.remote
+
+    def _command(self, *args: str) -> Tuple[str, ...]:
+        rsh = ("--rsh", self.rsh) if self.rsh else ()
+        return ("rsync", *rsh, *args)
+
+    def _list(self) -> Manifest:
+        output = subprocess.run(self._command("--list-only", "--recursive", self.remote),
+                                check=True,
+                                capture_output=True,
+                                text=True).stdout
+        files = {}
+        for line in output.splitlines():
+            match = _RSYNC_LINE.match(line)
+            if match is None or not match.group(1).startswith("-"):
+                continue
+            perms, size, mtime, name = match.groups()
+            mtime_ns = int(time.mktime(time.strptime(mtime, "%Y/%m/%d %H:%M:%S")) * 1e9)
+            files[name] = FileEntry(int(re.sub(r"[,.]", "", size)), mtime_ns)
+        return Manifest(self.root, files, {})
+
+    def _fetch(self, files: Dict[str, FileEntry], target_dir: Path):
+        target_dir.mkdir(parents=True, exist_ok=True)
+        subprocess.run(self._command("--archive", *self.options, "--files-from=-", self.remote,
+                                     str(target_dir)),
+                       input="\n".join(files),
+                       check=True,
+                       capture_output=True,
+                       text=True)
+
+    async def fetch(self, files: Dict[str, FileEntry], target_dir: Path) -> int:
+        await run_in_executor("copy", self._fetch, files, target_dir)
+        return sum(entry.size for entry in files.values())
+
+    def __str__(self) -> str:
+        return self.remote
+
+    def __repr__(self) -> str:
+        return f"RsyncSource({self.remote!r})"
@@ -2,7 +2,79 @@
 
 import contextvars
 import functools
-from asyncio import get_running_loop
+import os
+import sys
+import threading
+import time
+import traceback
+from asyncio import get_running_loop, sleep
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from typing import Dict, Optional
+
+logger = getLogger(__name__)
+
+# blocking work is split by workload so that, e.g., a burst of large copies cannot starve the
+# result writes. Override the sizes with `ML_SCHEDULER_<WORKLOAD>_THREADS` or `set_executor_sizes`
+EXECUTOR_SIZES: Dict[str, int] = {
+    "copy": 4,  # copying files to a `DiskPool`
+    "metadata": 8,  # listing, stat and removing folders
+    "table": 2,  # reading and writing csv / sqlite results
+    "user": min(32, (os.cpu_count() or 1) + 4),  # `to_thread` and `exp.to_thread`
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+# sizes given to `set_executor_sizes`, which take precedence over the environment
+_explicit_sizes: Dict[str, int] = {}
+_lock = threading.Lock()
+
+
+def set_executor_sizes(**sizes: int):
+    """Set the number of threads of some workloads, e.g. `set_executor_sizes(copy=8)`. They
+    override `ML_SCHEDULER_<WORKLOAD>_THREADS`.
+
+    Executors already started keep their size until they are shut down.
+    """
+    for workload in sizes:
+        if workload not in EXECUTOR_SIZES:
+            raise ValueError(f"Unknown workload {workload!r}, expected {list(EXECUTOR_SIZES)}")
+    _explicit_sizes.update(sizes)
+
+
+def get_executor(workload: str) -> ThreadPoolExecutor:
+    """The executor of a workload: `"copy"`, `"metadata"`, `"table"` or `"user"`."""
+    executor = _executors.get(workload)
+    if executor is not None:
+        return executor
+    if workload not in EXECUTOR_SIZES:
+        raise ValueError(f"Unknown workload {workload!r}, expected {list(EXECUTOR_SIZES)}")
+    with _lock:
+        if workload not in _executors:
+            size = _explicit_sizes.get(workload)
+            if size is None:
+                size = int(os.environ.get(f"ML_SCHEDULER_{workload.upper()}_THREADS",
+                                          EXECUTOR_SIZES[workload]))
+            _executors[workload] = ThreadPoolExecutor(size,
+                                                      thread_name_prefix=f"ml_scheduler-{workload}")
+        return _executors[workload]
+
+
+def shutdown_executors(wait: bool = True):
+    """Shut down the executors, e.g. to resize them. They are started again on next use."""
+    with _lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait)
+
+
+async def run_in_executor(workload: str, func, /, *args, **kwargs):
+    """Asynchronously run function *func* in the executor of *workload*, propagating the
+    current :class:`contextvars.Context` like `to_thread`."""
+    loop = get_running_loop()
+    ctx = contextvars.copy_context()
+    func_call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(workload), func_call)
 
 
 async def to_thread(func, /, *args, **kwargs):
@@ -13,9 +85,78 @@ async def to_thread(func, /, *args, **kwargs):
     allowing context variables from the main thread to be accessed in the
     separate thread.
 
+    The thread is taken from the `"user"` executor, so blocking user code does
+    not compete with the copies and result writes of the scheduler.
+
     Return a coroutine that can be awaited to get the eventual result of *func*.
     """
-    loop = get_running_loop()
-    ctx = contextvars.copy_context()
-    func_call = functools.partial(ctx.run, func, *args, **kwargs)
-    return await loop.run_in_executor(None, func_call)
+    return await run_in_executor("user", func, *args, **kwargs)
+
+
+class StallDetector:
+    """Report the stack of the event loop when a callback blocks it for more than `threshold`
+    seconds, e.g. a sync HTTP call in an experiment function.
+
+    A task on the loop updates a heartbeat, and a watchdog thread logs the stack of the loop
+    thread when the heartbeat is late. It stops with the loop.
+
+    Args:
+        threshold (`float`, optional): Seconds the loop may be blocked before reporting. Defaults to 0.5.
+    """
+
+    def __init__(self, threshold: float = 0.5):
+        self.threshold = threshold
+        self.stalls = 0
+        self._beat = time.monotonic()
+        self._running = False
+
+    def start(self):
+        """Start watching the running event loop."""
+        loop = get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._running = True
+        self._task = loop.create_task(self._heartbeat())
+        threading.Thread(target=self._watch, name="ml_scheduler-stall-detector",
+                         daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stop watching, e.g. when the runner returns."""
+        self._running = False
+        self._task.cancel()
+
+    async def _heartbeat(self):
+        try:
+            while True:
+                self._beat = time.monotonic()
+                await sleep(self.threshold / 4)
+        finally:
+            self._running = False
+
+    def _watch(self):
+        reported = None
+        while self._running:
+            time.sleep(self.threshold / 4)
+            beat = self._beat
+            blocked = time.monotonic() - beat
+            if blocked < self.threshold or beat == reported or not self._running:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            # report each stall once
+            reported = beat
+            self.stalls += 1
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(f"Event loop blocked for {blocked:.2f}s, offload blocking calls with "
+                           f"`exp.to_thread`:\n{stack}")
+
+
+def detect_stalls(threshold: Optional[float] = None) -> Optional[StallDetector]:
+    """Start a `StallDetector` on the running loop if `threshold` is given or the
+    `ML_SCHEDULER_STALL_THRESHOLD` environment variable is set (in seconds)."""
+    if threshold is None:
+        threshold = os.environ.get("ML_SCHEDULER_STALL_THRESHOLD")
+        if not threshold:
+            return None
+    return StallDetector(float(threshold)).start()
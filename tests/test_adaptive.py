@@ -0,0 +1,117 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import ml_scheduler.adaptive
+from ml_scheduler import AIMDController
+from ml_scheduler.pools import CounterPool
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(ml_scheduler.adaptive, "time",
+                        SimpleNamespace(monotonic=lambda: clock.now, time=time.time))
+    return clock
+
+
+def window(controller, clock, amount=10.0, errors=0, latency=None, seconds=10):
+    for i in range(10):
+        controller.record(amount / 10, error=i < errors, latency=latency)
+    clock.now += seconds
+    return controller.step()
+
+
+def test_probe_and_throughput_drop(clock):
+    pool = CounterPool(2)
+    controller = AIMDController(pool, "size", lower=1, upper=4, interval=60)
+    assert pool.controllers == [controller]
+
+    decision = window(controller, clock)
+    assert (decision.old, decision.new, decision.reason) == (2, 3, "probe")
+    assert decision.throughput == pytest.approx(1)
+    assert pool.size == 3 and pool.available_size == 3
+
+    decision = window(controller, clock, amount=5)
+    assert (decision.old, decision.new, decision.reason) == (3, 2, "throughput dropped")
+
+    # a back off is not compared with the window before it
+    decision = window(controller, clock, amount=1)
+    assert decision.reason == "probe"
+
+
+def test_latency_rise(clock):
+    target = SimpleNamespace(limit=4.0)
+    controller = AIMDController(target, "limit", lower=1, upper=8, interval=60)
+    assert window(controller, clock, latency=1.0).reason == "probe"
+    decision = window(controller, clock, latency=2.0)
+    assert (decision.new, decision.reason) == (2.5, "latency rose")
+    assert decision.latency == 2.0
+
+
+def test_error_rate(clock):
+    target = SimpleNamespace(limit=6)
+    controller = AIMDController(target, "limit", lower=1, upper=8, interval=60)
+    decision = window(controller, clock, errors=2)
+    assert (decision.new, decision.reason) == (3, "error rate")
+    assert decision.error_rate == pytest.approx(0.2)
+    # at the threshold is fine
+    assert window(controller, clock, errors=1).reason == "probe"
+
+
+def test_integer_clipping(clock):
+    target = SimpleNamespace(limit=2)
+    controller = AIMDController(target, "limit", lower=1, upper=3, decrease=0.9, interval=60)
+    # 2 * 0.9 rounds back to 2, integer limits always move
+    assert window(controller, clock, errors=5).new == 1
+    assert window(controller, clock, errors=5).new == 1
+    for _ in range(3):
+        window(controller, clock)
+    assert target.limit == 3
+    assert isinstance(target.limit, int)
+
+
+def test_inverse(clock):
+    target = SimpleNamespace(min_memory=80.0)
+    controller = AIMDController(target, "min_memory", lower=50, upper=95, increase=5,
+                                inverse=True, interval=60)
+    assert window(controller, clock).new == 75
+    # back off towards `upper`
+    assert window(controller, clock, errors=5).new == 85
+    target.min_memory = 52.0
+    assert window(controller, clock).new == 50
+
+
+def test_hold_without_probe(clock):
+    headroom = SimpleNamespace(ok=False)
+    target = SimpleNamespace(limit=2)
+    controller = AIMDController(target, "limit", lower=1, upper=4, interval=60,
+                                probe=lambda: headroom.ok)
+    decision = window(controller, clock)
+    assert (decision.new, decision.reason) == (2, "hold")
+    headroom.ok = True
+    assert window(controller, clock).reason == "probe"
+    assert target.limit == 3
+
+
+def test_no_samples(clock):
+    target = SimpleNamespace(limit=2)
+    controller = AIMDController(target, "limit", lower=1, upper=4, interval=60)
+    clock.now += 100
+    assert controller.step() is None
+    assert target.limit == 2
+    assert not controller.decisions
+
+
+def test_observe_steps_after_interval(clock):
+    pool = CounterPool(2)
+    controller = AIMDController(pool, "size", lower=1, upper=4, interval=10, max_decisions=2)
+    for steps in range(3):
+        clock.now += 5
+        pool.observe()
+        assert len(controller.decisions) == min(steps, 2)
+        clock.now += 5
+        pool.observe()
+    assert pool.size == 4
+    assert [decision.new for decision in controller.decisions] == [4, 4]
@@ -0,0 +1,49 @@
+import asyncio
+
+import ml_scheduler
+from ml_scheduler import Exp
+from ml_scheduler.pools.base import BaseAllocator, BaseElement, BasePool
+
+
+class SlotAllocator(BaseAllocator[BaseElement]):
+    """An allocator written against the `_allocate(size)` contract."""
+
+    async def _allocate(self, size: int):
+        allocated = []
+        for element in self.pool:
+            if len(allocated) < size:
+                allocated.extend(element.allocate())
+        return allocated
+
+
+class SlotPool(BasePool):
+
+    def __init__(self, size: int):
+        self.pool = [BaseElement(1, False) for _ in range(size)]
+        self.allocate = SlotAllocator(self)
+
+
+def test_allocate_contract():
+    pool = SlotPool(3)
+
+    async def main():
+        exp = Exp(None, "a")
+        resource = await exp.get(pool.allocate, 2)
+        assert resource.size() == 2
+        assert await pool.allocate.try_allocate(2) is None
+        await exp.cleanup()
+        return await pool.allocate.try_allocate(3)
+
+    assert asyncio.run(main()).size() == 3
+
+
+def test_declared_resources():
+    pool = SlotPool(2)
+
+    @ml_scheduler.exp_func(resources={"slots": (pool.allocate, 2)})
+    async def train(exp):
+        return exp.allocations["slots"].size()
+
+    _, result = asyncio.run(train(Exp(None, "a")))
+    assert result == 2
+    assert not any(element.is_allocated() for element in pool)
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from ml_scheduler.pools import ConnectionPool
+
+
+class Client:
+
+    def __init__(self):
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_clients_are_reused():
+    created = []
+
+    def factory():
+        created.append(Client())
+        return created[-1]
+
+    pool = ConnectionPool(factory, size=2)
+
+    async def main():
+        first = await pool.allocate(1)
+        client = first[0].client
+        await first.cleanup()
+        assert pool.available_size == 2
+
+        second = await pool.allocate(2)
+        assert client in [element.client for element in second]
+        assert pool.available_size == 0
+        assert await pool.allocate.try_allocate(1) is None
+        await second.cleanup()
+
+        await pool.aclose()
+
+    asyncio.run(main())
+    assert len(created) == 2
+    assert all(client.closed for client in created)
+
+
+def test_async_factory():
+
+    async def factory():
+        return Client()
+
+    pool = ConnectionPool(factory, size=1)
+    resource = asyncio.run(pool.allocate(1))
+    assert isinstance(resource[0].client, Client)
+
+
+def test_failed_factory_releases_the_slot():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("refused")
+        return Client()
+
+    pool = ConnectionPool(factory, size=2)
+    with pytest.raises(ConnectionError):
+        asyncio.run(pool.allocate(1))
+    assert pool.available_size == 2
+
+    resource = asyncio.run(pool.allocate(2))
+    assert all(isinstance(element.client, Client) for element in resource)
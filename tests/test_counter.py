@@ -0,0 +1,59 @@
+import asyncio
+
+from ml_scheduler.pools import CounterPool
+
+
+def test_allocate_and_release():
+    pool = CounterPool(4)
+    first = asyncio.run(pool.allocate(3))
+    assert first.size() == 3
+    assert pool.available_size == 1
+    assert asyncio.run(pool.allocate.try_allocate(2)) is None
+    # a failed attempt gives back what it took
+    assert pool.available_size == 1
+
+    first.release()
+    first.release()
+    assert pool.available_size == 4
+    assert asyncio.run(pool.allocate.try_allocate(4)).size() == 4
+    assert pool.available_size == 0
+
+
+def test_available_at_start():
+    pool = CounterPool(4, available=1)
+    assert pool.capacity == 4
+    assert pool.available_size == 1
+
+
+def test_allocate_waits():
+    pool = CounterPool(2)
+
+    async def main():
+        first = await pool.allocate(2)
+        waiting = asyncio.create_task(pool.allocate(1))
+        await asyncio.sleep(0.1)
+        assert not waiting.done()
+        await first.cleanup()
+        return await asyncio.wait_for(waiting, 3)
+
+    assert asyncio.run(main()).size() == 1
+    assert pool.available_size == 1
+
+
+def test_resize():
+    pool = CounterPool(4)
+    resource = asyncio.run(pool.allocate(3))
+
+    pool.size = 6
+    assert pool.capacity == 6
+    assert pool.available_size == 3
+
+    # shrinking keeps the slots in use, `free` is negative until they are released
+    pool.size = 1
+    assert pool.available_size == -2
+    assert asyncio.run(pool.allocate.try_allocate(1)) is None
+    assert pool.available_size == -2
+
+    resource.release()
+    assert pool.available_size == 1
+    assert repr(pool) == "CounterPool(avai=1, size=1)"
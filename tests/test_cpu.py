@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+import ml_scheduler.pools.cpu
+from ml_scheduler import Exp
+from ml_scheduler.pools import CPUPool
+from ml_scheduler.pools.cpu import THREAD_ENV_VARS, parse_cpulist
+
+
+@pytest.mark.parametrize("cpulist, cores", [
+    ("0", [0]),
+    ("0-3", [0, 1, 2, 3]),
+    ("0-1,8-9\n", [0, 1, 8, 9]),
+    ("2,4,", [2, 4]),
+    ("", []),
+])
+def test_parse_cpulist(cpulist, cores):
+    assert parse_cpulist(cpulist) == cores
+
+
+@pytest.fixture
+def two_nodes(monkeypatch):
+    nodes = {0: [0, 1, 2, 3], 1: [4, 5, 6, 7]}
+    monkeypatch.setattr(ml_scheduler.pools.cpu, "numa_nodes", lambda: nodes)
+    monkeypatch.setattr(ml_scheduler.pools.cpu, "device_node", lambda gpu: gpu.node)
+    return CPUPool(cores=list(range(8)), cores_per_gpu=2)
+
+
+def cores(resource):
+    return sorted(element.core for element in resource)
+
+
+def test_prefers_gpu_node(two_nodes):
+    pool = two_nodes
+    gpus = [SimpleNamespace(node=1)]
+    resource = asyncio.run(pool.allocate(cuda=gpus))
+    assert cores(resource) == [4, 5]
+    assert pool.available_size == 6
+
+    resource = asyncio.run(pool.allocate(3, cuda=gpus, per_gpu=8))
+    assert cores(resource) == [0, 6, 7]
+
+
+def test_prefers_node_with_most_free_cores(two_nodes):
+    pool = two_nodes
+    first = asyncio.run(pool.allocate(3))
+    assert cores(first) == [0, 1, 2]
+    # node 1 now has more free cores
+    assert cores(asyncio.run(pool.allocate(2))) == [4, 5]
+
+    first.release()
+    assert cores(asyncio.run(pool.allocate(4))) == [0, 1, 2, 3]
+    assert asyncio.run(pool.allocate.try_allocate(3)) is None
+
+
+def test_run_pins_and_limits_threads():
+    core = min(os.sched_getaffinity(0))
+    pool = CPUPool(cores=[core])
+    exp = Exp(None, "uuid")
+
+    child = ("import json, os; print(json.dumps([sorted(os.sched_getaffinity(0)), "
+             f"[os.environ.get(v) for v in {THREAD_ENV_VARS!r}]]))")
+
+    async def main():
+        await exp.get(pool.allocate, 1)
+        assert exp.cores == [core]
+        pinned = await exp.run([sys.executable, "-c", child], env=None)
+        given = await exp.run([sys.executable, "-c", child], env={"OMP_NUM_THREADS": "3"})
+        await exp.cleanup()
+        return pinned, given
+
+    pinned, given = asyncio.run(main())
+    assert pinned.strip() == f'[[{core}], ["1", "1", "1", "1", "1"]]'
+    # variables already in `env` are kept
+    assert given.strip() == f'[[{core}], ["3", "1", "1", "1", "1"]]'
+    assert pool.available_size == 1
@@ -0,0 +1,105 @@
+import asyncio
+
+import pandas
+import pytest
+
+import ml_scheduler
+
+INTERVAL = 0.2
+
+
+@pytest.fixture
+def csv_path(tmp_path, monkeypatch):
+    # the lock file is next to a relative path
+    monkeypatch.chdir(tmp_path)
+    pandas.DataFrame({"x": ["a", "b"], "loss": [None, None]}).to_csv("exps.csv", index=False)
+    return "exps.csv"
+
+
+def edit(csv_path, func):
+    df = pandas.read_csv(csv_path, index_col=":uuid:")
+    df = func(df)
+    df.to_csv(csv_path, index=True)
+
+
+def watch(csv_path, test, slow=None):
+    """Run the rows of `csv_path` while `test(runs)` edits it. `runs` counts the runs by `x`.
+    The row `slow` waits for `go` and then keeps reporting until cancelled."""
+    runs = {}
+    go = asyncio.Event() if slow else None
+
+    @ml_scheduler.exp_func
+    async def train(exp, x):
+        runs[x] = runs.get(x, 0) + 1
+        if x == slow:
+            await go.wait()
+            while True:
+                await exp.report(step=runs[x])
+                await asyncio.sleep(INTERVAL * 4)
+        await exp.report(loss=len(x))
+
+    async def main():
+        task = asyncio.create_task(
+            train.arun_csv(csv_path, ["loss"], watch=True, watch_interval=INTERVAL))
+        try:
+            await test(runs, go)
+        finally:
+            task.cancel()
+
+    asyncio.run(main())
+
+
+def losses(csv_path):
+    return pandas.read_csv(csv_path)["loss"].tolist()
+
+
+async def until(predicate, timeout=INTERVAL * 10):
+    for _ in range(int(timeout / 0.05)):
+        if predicate():
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+def test_append(csv_path):
+
+    async def test(runs, go):
+        assert await until(lambda: losses(csv_path) == [1, 1])
+        await asyncio.sleep(INTERVAL)
+        with open(csv_path, "a") as f:
+            f.write(",cc,\n")
+            f.write("given-uuid,ddd,\n")
+        assert await until(lambda: "cc" in runs and "ddd" in runs)
+        await asyncio.sleep(INTERVAL * 2)
+        df = pandas.read_csv(csv_path, index_col=":uuid:")
+        assert df["loss"].tolist() == [1, 1, 2, 3]
+        assert runs == {"a": 1, "b": 1, "cc": 1, "ddd": 1}
+        assert df.index[-1] == "given-uuid"
+        assert not df.index.isnull().any()
+
+    watch(csv_path, test)
+
+
+def test_renull(csv_path):
+
+    async def test(runs, go):
+        assert await until(lambda: losses(csv_path) == [1, 1])
+        await asyncio.sleep(INTERVAL * 2)
+        edit(csv_path, lambda df: df.assign(loss=df["loss"].where(df["x"] != "a")))
+        assert await until(lambda: runs["a"] == 2)
+        assert runs["b"] == 1
+
+    watch(csv_path, test)
+
+
+def test_renull_during_report(csv_path):
+
+    async def test(runs, go):
+        assert await until(lambda: runs.get("b") == 1 and losses(csv_path)[0] == 1)
+        await asyncio.sleep(INTERVAL * 2)
+        edit(csv_path, lambda df: df.assign(loss=df["loss"].where(df["x"] != "a")))
+        # the running row writes a metric before the next poll
+        go.set()
+        assert await until(lambda: runs["a"] == 2)
+
+    watch(csv_path, test, slow="b")
@@ -0,0 +1,65 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from ml_scheduler.pools import CUDAPool
+from ml_scheduler.pools import cuda as cuda_module
+
+
+class FakeDevice:
+
+    def __init__(self, cuda_index: int, memory_percent: float):
+        self.cuda_index = cuda_index
+        self.percent = memory_percent
+
+    def memory_percent(self) -> float:
+        return self.percent
+
+
+@pytest.fixture
+def devices(monkeypatch):
+    # an idle GPU, a busy one and a half used one
+    devices = [FakeDevice(0, 0.5), FakeDevice(1, 95.0), FakeDevice(2, 50.0)]
+    fake = SimpleNamespace(cuda=SimpleNamespace(all=lambda: devices))
+    monkeypatch.setattr(cuda_module, "Device", fake)
+    return devices
+
+
+def test_idle_gpus_are_available(devices):
+    pool = CUDAPool([0, 1, 2], 90)
+    assert pool.available_size == 1
+    allocated = asyncio.run(pool.allocate.try_allocate(1))
+    assert [element.cuda_index for element in allocated] == [0]
+    assert asyncio.run(pool.allocate.try_allocate(1)) is None
+
+    allocated.release()
+    assert pool.available_size == 1
+
+
+def test_min_memory(devices):
+    pool = CUDAPool([0, 1, 2], 40)
+    assert pool.available_size == 2
+    assert pool.memory_headroom() == 5.0
+
+    # e.g. tuned by `AIMDController(inverse=True)`
+    pool.min_memory = 3
+    assert pool.available_size == 3
+    pool.min_memory = 99
+    assert pool.available_size == 1
+
+    devices[0].percent = 10
+    assert pool.available_size == 0
+
+
+def test_allocate_waits_for_a_free_gpu(devices):
+    pool = CUDAPool([1], 20)
+
+    async def main():
+        task = asyncio.create_task(pool.allocate(1))
+        await asyncio.sleep(0.1)
+        assert not task.done()
+        devices[1].percent = 10
+        return await asyncio.wait_for(task, 3)
+
+    assert [element.cuda_index for element in asyncio.run(main())] == [1]
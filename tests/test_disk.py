@@ -0,0 +1,54 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import ml_scheduler.pools.disk
+from ml_scheduler import Exp
+from ml_scheduler.pools import DiskPool
+
+
+@pytest.fixture
+def pool(monkeypatch, tmp_path):
+    usage = SimpleNamespace(total=100 * 10**9, free=50 * 10**9)
+    monkeypatch.setattr(ml_scheduler.pools.disk.psutil, "disk_usage", lambda path: usage)
+    return DiskPool(str(tmp_path))
+
+
+def test_allocate(pool):
+
+    async def main():
+        exp = Exp(None, "a")
+        resource = await exp.get(pool.allocate, 10)
+        assert pool.available_size == 40
+        assert await pool.allocate.try_allocate(41) is None
+        await exp.cleanup()
+        return resource
+
+    (element, ) = asyncio.run(main())
+    assert (element.size, element.source_folder, element.target_folder) == (10, None, None)
+    assert pool.available_size == 50
+
+
+def test_copy_folder(pool, tmp_path):
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "weights.bin").write_bytes(b"0" * 100)
+    target = tmp_path / "target"
+
+    async def main():
+        resource = await pool.copy_folder(str(source), str(target))
+        assert (target / "weights.bin").read_bytes() == b"0" * 100
+        return resource
+
+    resource = asyncio.run(main())
+    assert resource.size() == 0
+    # nothing is reserved for less than a unit
+    assert pool.pre_allocated == 0
+
+    held = asyncio.run(pool.copy_folder.try_allocate(5, str(source), str(tmp_path / "other")))
+    (element, ) = held
+    assert (element.source_folder, element.target_folder) == (str(source), str(tmp_path / "other"))
+    assert pool.available_size == 45
+    held.release()
+    assert pool.available_size == 50
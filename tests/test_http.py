@@ -0,0 +1,150 @@
+import asyncio
+import json
+
+import ml_scheduler
+
+
+@ml_scheduler.exp_func
+async def train(exp, lr, fail=False, sleep=0.0):
+    await asyncio.sleep(sleep)
+    if fail:
+        raise RuntimeError("diverged")
+    await exp.report(loss=1 / lr)
+    return lr
+
+
+async def request(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    content = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                 f"Content-Length: {len(content)}\r\n\r\n".encode() + content)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+def serve(test, **kwargs):
+    """Run `test(runner)` against a runner serving on a free port."""
+
+    async def main():
+        runner = train._http_runner
+        server = asyncio.create_task(runner.arun(port=0, **kwargs))
+        while not hasattr(runner, "port"):
+            await asyncio.sleep(0.01)
+        try:
+            await test(runner)
+        finally:
+            server.cancel()
+            del runner.port
+
+    asyncio.run(main())
+
+
+def test_submit_and_long_poll():
+
+    async def test(runner):
+        status, body = await request(runner.port, "POST", "/experiments", {"lr": 0.5})
+        assert status == 201
+        status, experiment = await request(runner.port, "GET",
+                                           f"/experiments/{body['uuid']}?wait=5")
+        assert status == 200
+        assert experiment["status"] == "finished"
+        assert experiment["metrics"] == {"loss": 2.0, ":retval:": 0.5}
+
+    serve(test)
+
+
+def test_bulk_and_failed():
+
+    async def test(runner):
+        status, body = await request(runner.port, "POST", "/experiments/bulk",
+                                     [{"lr": 1}, {"lr": 2, "fail": True}])
+        assert status == 201
+        ok, failed = body["uuids"]
+        _, experiment = await request(runner.port, "GET", f"/experiments/{failed}?wait=5")
+        assert experiment["status"] == "failed"
+        assert experiment["error"] == "RuntimeError: diverged"
+        _, experiment = await request(runner.port, "GET", f"/experiments/{ok}?wait=5")
+        assert experiment["status"] == "finished"
+
+        status, _ = await request(runner.port, "POST", "/experiments/bulk", {"lr": 1})
+        assert status == 400
+
+    serve(test)
+
+
+def test_bulk_is_atomic():
+
+    async def test(runner):
+        running = {":uuid:": "a", "lr": 1, "sleep": 10}
+        assert (await request(runner.port, "POST", "/experiments", running))[0] == 201
+
+        for rows, status in [
+            ([{":uuid:": "b", "lr": 1}, running], 409),
+            ([{":uuid:": "b", "lr": 1}, {":uuid:": "b", "lr": 2}], 409),
+            ([{":uuid:": "b", "lr": 1}, 5], 400),
+        ]:
+            assert (await request(runner.port, "POST", "/experiments/bulk", rows))[0] == status
+            # none of the rows is submitted
+            assert (await request(runner.port, "GET", "/experiments/b"))[0] == 404
+            assert list(runner.experiments) == ["a"]
+
+    serve(test)
+
+
+def test_conflict_and_cancel():
+
+    async def test(runner):
+        row = {":uuid:": "a", "lr": 1, "sleep": 10}
+        assert (await request(runner.port, "POST", "/experiments", row))[0] == 201
+        assert (await request(runner.port, "POST", "/experiments", row))[0] == 409
+        assert (await request(runner.port, "DELETE", "/experiments/a"))[0] == 200
+        _, experiment = await request(runner.port, "GET", "/experiments/a?wait=5")
+        assert experiment["status"] == "cancelled"
+        assert (await request(runner.port, "DELETE", "/experiments/a"))[0] == 409
+        assert (await request(runner.port, "DELETE", "/experiments/b"))[0] == 404
+
+    serve(test)
+
+
+def test_events_poll_and_stream():
+
+    async def test(runner):
+        reader, writer = await asyncio.open_connection("127.0.0.1", runner.port)
+        writer.write(b"GET /events HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        await writer.drain()
+        assert (await reader.readline()).startswith(b"HTTP/1.1 200")
+
+        poll = asyncio.create_task(request(runner.port, "GET", "/events/poll?since=0&wait=5"))
+        await asyncio.sleep(0.1)
+        _, body = await request(runner.port, "POST", "/experiments", {"lr": 1})
+        _, events = await poll
+        assert events[0]["event"] == "submitted"
+        assert events[0]["uuid"] == body["uuid"]
+
+        names = []
+        while "finished" not in names:
+            line = await asyncio.wait_for(reader.readline(), 5)
+            if line.startswith(b"event: "):
+                names.append(line[7:].strip().decode())
+        assert names == ["submitted", "metric", "finished"]
+        writer.close()
+
+    serve(test)
+
+
+def test_evict_finished():
+
+    async def test(runner):
+        uuids = []
+        for lr in range(1, 5):
+            _, body = await request(runner.port, "POST", "/experiments", {"lr": lr})
+            await request(runner.port, "GET", f"/experiments/{body['uuid']}?wait=5")
+            uuids.append(body["uuid"])
+        assert list(runner.experiments) == uuids[-2:]
+        assert set(runner.tasks) == set(uuids[-2:])
+        assert (await request(runner.port, "GET", f"/experiments/{uuids[0]}"))[0] == 404
+
+    serve(test, max_finished=2)
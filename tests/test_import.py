@@ -0,0 +1,54 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ("pandas", "numpy", "nvitop", "coloredlogs", "psutil", "readchar")
+
+# seconds spent importing ml_scheduler itself, once the stdlib modules it needs are loaded
+IMPORT_BUDGET = 0.15
+
+SCRIPT = """
+import asyncio, concurrent.futures, json, logging, subprocess, sys, time
+start = time.perf_counter()
+import ml_scheduler
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def _import_in_subprocess(script: str = SCRIPT) -> dict:
+    output = subprocess.run([sys.executable, "-c", script],
+                            cwd=ROOT,
+                            check=True,
+                            capture_output=True,
+                            text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def test_heavy_backends_are_not_imported():
+    modules = set(_import_in_subprocess()["modules"])
+    assert not modules & set(HEAVY_MODULES), sorted(modules & set(HEAVY_MODULES))
+
+
+def test_import_time_budget():
+    # the best of a few runs, to be robust to a busy machine
+    elapsed = min(_import_in_subprocess()["elapsed"] for _ in range(3))
+    assert elapsed < IMPORT_BUDGET, f"import ml_scheduler took {elapsed:.3f}s"
+
+
+def test_lazy_attributes():
+    script = """
+import json, sys
+import ml_scheduler
+from ml_scheduler.pools import DiskPool
+before = "psutil" in sys.modules and "ml_scheduler.pools.disk" in sys.modules
+exp_func = ml_scheduler.exp_func(lambda exp: None)
+exp_func.run_csv
+print(json.dumps({"disk": before, "pandas": "pandas" in sys.modules,
+                  "name": DiskPool.__module__}))
+"""
+    result = _import_in_subprocess(script)
+    assert result == {"disk": True, "pandas": True, "name": "ml_scheduler.pools.disk"}
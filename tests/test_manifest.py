@@ -0,0 +1,88 @@
+import asyncio
+import os
+
+import pytest
+
+from ml_scheduler.pools.manifest import FileEntry, ManifestCache, scan
+
+
+def write(path, content="x"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+def touch_dir(path):
+    # file systems with a coarse mtime may not tell two writes apart
+    mtime_ns = path.stat().st_mtime_ns + 1_000_000_000
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "ckpt"
+    write(root / "config.json", "{}")
+    write(root / "shards" / "0.bin", "0" * 10)
+    write(root / "shards" / "deep" / "1.bin", "1" * 20)
+    return root
+
+
+def test_nested(tree):
+    manifest = asyncio.run(scan(str(tree), parallel=1))
+    assert sorted(manifest.files) == ["config.json", "shards/0.bin", "shards/deep/1.bin"]
+    mtime_ns = (tree / "shards" / "0.bin").stat().st_mtime_ns
+    assert manifest.files["shards/0.bin"] == FileEntry(10, mtime_ns)
+    assert sorted(manifest.dirs) == ["", "shards", "shards/deep"]
+    assert manifest.total_size() == 32
+    assert manifest.total_size(["config.json", os.path.join("shards", "0.bin")]) == 12
+    with pytest.raises(FileNotFoundError):
+        manifest.select(["missing.bin"])
+
+
+def test_missing_root(tmp_path):
+    cache = ManifestCache()
+    root = tmp_path / "later"
+    assert asyncio.run(cache.get(str(root))).files == {}
+    write(root / "a.bin")
+    assert list(asyncio.run(cache.get(str(root))).files) == ["a.bin"]
+
+
+def test_cache_invalidation(tree):
+    cache = ManifestCache()
+
+    async def get():
+        return await cache.get(str(tree))
+
+    first = asyncio.run(get())
+    assert asyncio.run(get()) is first
+
+    # adding a file changes the mtime of its directory
+    write(tree / "shards" / "deep" / "2.bin")
+    touch_dir(tree / "shards" / "deep")
+    second = asyncio.run(get())
+    assert second is not first
+    assert "shards/deep/2.bin" in second.files
+
+    # rewriting in place does not
+    write(tree / "config.json", "{\"a\": 1}")
+    assert asyncio.run(get()) is second
+    cache.invalidate(str(tree))
+    assert asyncio.run(get()).files["config.json"].size == 8
+
+
+def test_symlinks(tree, tmp_path):
+    outside = tmp_path / "outside"
+    write(outside / "tokenizer.json")
+    (tree / "tokenizer").symlink_to(outside)
+    (tree / "shards" / "deep" / "loop").symlink_to(tree)
+    (tree / "shards" / "self").symlink_to(".")
+    (tree / "link.bin").symlink_to(tree / "shards" / "0.bin")
+
+    manifest = asyncio.run(asyncio.wait_for(scan(str(tree)), 10))
+    assert sorted(manifest.files) == [
+        "config.json",
+        "link.bin",
+        "shards/0.bin",
+        "shards/deep/1.bin",
+        "tokenizer/tokenizer.json",
+    ]
+    assert manifest.files["link.bin"].size == 10
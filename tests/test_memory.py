@@ -0,0 +1,45 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import ml_scheduler.pools.memory
+from ml_scheduler.pools.memory import MemoryPool
+
+GB = 1_000_000_000
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    memory = SimpleNamespace(total=64 * GB, available=48 * GB)
+    monkeypatch.setattr(ml_scheduler.pools.memory.psutil, "virtual_memory", lambda: memory)
+    return memory
+
+
+def test_reserve_and_release(memory):
+    pool = MemoryPool(headroom=4)
+    assert pool.capacity == 60
+    assert pool.available_size == 44
+
+    first = asyncio.run(pool.allocate(20))
+    assert pool.reserved == 20
+    # limited by the reservations until the experiment actually uses the memory
+    memory.available = 60 * GB
+    assert pool.available_size == 40
+
+    assert asyncio.run(pool.allocate.try_allocate(41)) is None
+    second = asyncio.run(pool.allocate(40))
+    assert pool.available_size == 0
+
+    first.release()
+    first.release()
+    assert pool.reserved == 40
+    asyncio.run(second.cleanup())
+    assert pool.reserved == 0
+
+
+def test_limited_by_available(memory):
+    pool = MemoryPool(unit="MB")
+    memory.available = 1 * GB
+    assert pool.available_size == 1000
+    assert asyncio.run(pool.allocate.try_allocate(1001)) is None
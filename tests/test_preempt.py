@@ -0,0 +1,111 @@
+import asyncio
+import sys
+
+import ml_scheduler
+from ml_scheduler import Exp, GangScheduler, PreemptionPolicy
+from ml_scheduler.pools import CounterPool
+
+# checkpoint and exit cleanly on SIGTERM, print the resume counter otherwise
+CHILD = """
+import os, signal, sys, time
+signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+print(os.environ.get("ML_SCHEDULER_RESUME", "0"), flush=True)
+time.sleep(float(sys.argv[1]))
+"""
+
+
+class Runner:
+
+    def __init__(self):
+        self.reports = []
+
+    async def _report(self, uuid, metrics):
+        self.reports.append((uuid, metrics))
+
+
+def test_preempt_and_requeue():
+    pool = CounterPool(1)
+    scheduler = GangScheduler(interval=0.1, preemption=PreemptionPolicy(grace=5))
+    events = []
+
+    @ml_scheduler.exp_func(resources={"slot": (pool.allocate, 1)},
+                           scheduler=scheduler,
+                           priority="priority")
+    async def train(exp, priority, seconds):
+        events.append((exp.uuid, "start", exp.preemptions))
+        stdout = await exp.run([sys.executable, "-c", CHILD, str(seconds)], env=None)
+        await exp.report(resume=stdout.strip())
+        events.append((exp.uuid, "done", exp.preemptions))
+        return exp.preemptions
+
+    async def main():
+        runner = Runner()
+        low = asyncio.create_task(train(Exp(runner, "low"), priority=0, seconds=1))
+        await asyncio.sleep(0.3)
+        high = asyncio.create_task(train(Exp(runner, "high"), priority=10, seconds=0))
+        return runner, await asyncio.wait_for(asyncio.gather(low, high), 20)
+
+    runner, ((low, low_result), (high, high_result)) = asyncio.run(main())
+
+    assert events == [
+        ("low", "start", 0),
+        ("high", "start", 0),
+        ("high", "done", 0),
+        ("low", "start", 1),
+        ("low", "done", 1),
+    ]
+    # the cut-short run reported nothing, the resumed one sees the resume counter
+    assert runner.reports == [("high", {"resume": "0"}), ("low", {"resume": "1"})]
+    assert (low_result, high_result) == (1, 0)
+    assert (low.attempt, low.preemptions, low.error) == (1, 1, None)
+    assert pool.free == 1
+
+
+def test_preempt_without_subprocess():
+    runs = []
+
+    @ml_scheduler.exp_func(resources={"slot": (CounterPool(1).allocate, 1)})
+    async def train(exp):
+        runs.append(exp.preemptions)
+        # the subprocess has already exited
+        await exp.run([sys.executable, "-c", "pass"], env=None)
+        await exp.preempt(grace=1)
+        await exp.report(done=1)
+
+    async def main():
+        runner = Runner()
+        exp, _ = await train(Exp(runner, "finished"))
+        return runner, exp
+
+    runner, exp = asyncio.run(main())
+    assert runs == [0]
+    assert runner.reports == [("finished", {"done": 1})]
+    assert (exp.preempted, exp.preemptions) == (False, 0)
+
+
+def test_flag_without_preempted_error():
+    runs = []
+
+    @ml_scheduler.exp_func
+    async def train(exp):
+        runs.append(exp.preemptions)
+        # e.g. the preemption raced with the end of the subprocess
+        exp.preempted = True
+
+    exp, _ = asyncio.run(train(Exp(Runner(), "finished")))
+    assert runs == [0]
+    assert not exp.preempted
+
+
+def test_procs_tracked_on_loop():
+
+    async def main():
+        exp = Exp(Runner(), "uuid")
+        run = asyncio.create_task(exp.run([sys.executable, "-c", CHILD, "0.5"], env=None))
+        while not exp.procs:
+            await asyncio.sleep(0.01)
+        assert all(proc.poll() is None for proc in exp.procs)
+        await run
+        return exp
+
+    assert not asyncio.run(main()).procs
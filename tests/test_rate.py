@@ -0,0 +1,105 @@
+import asyncio
+import time
+
+import pytest
+
+from ml_scheduler.pools import CounterPool, RatePool
+from ml_scheduler.pools.rate import TokenBucket
+
+
+def test_bucket_refill():
+    bucket = TokenBucket(rate=2, burst=4)
+    now = bucket.updated
+    bucket.tokens = 0
+    assert bucket.wait_time(1, now) == pytest.approx(0.5)
+    assert bucket.wait_time(1, now + 1) == 0
+    assert bucket.tokens == pytest.approx(2)
+    # never above the burst
+    bucket.refill(now + 100)
+    assert bucket.tokens == 4
+
+
+def test_allocate_waits_for_tokens():
+    pool = RatePool(10, burst=2)
+
+    async def main():
+        start = time.monotonic()
+        for _ in range(4):
+            await pool.allocate(1)
+        return time.monotonic() - start
+
+    # the burst is free, then one token every 0.1s
+    assert 0.15 <= asyncio.run(main()) < 1
+    with pytest.raises(ValueError):
+        asyncio.run(pool.allocate(3))
+
+
+def test_key_rates():
+    pool = RatePool(1, key_rates={"fast": 100})
+    assert pool.bucket("fast").rate == 100
+    assert pool.bucket("other").rate == 1
+    assert pool.bucket() is pool.bucket(None)
+
+
+def test_try_allocate():
+    pool = RatePool(1, burst=1)
+    assert asyncio.run(pool.allocate.try_allocate(1)) is not None
+    assert asyncio.run(pool.allocate.try_allocate(1)) is None
+
+
+def test_throttled_and_recovery():
+    pool = RatePool(10, backoff=0.5, recovery=0.1)
+    bucket = pool.bucket("host")
+
+    pool.throttled("host", retry_after=0.2)
+    assert bucket.rate == 5
+    assert bucket.tokens <= 0
+    assert bucket.wait_time(1, time.monotonic()) == pytest.approx(0.2, abs=0.05)
+
+    # each successful request recovers a fraction of the nominal rate
+    bucket.paused_until = 0
+    bucket.tokens = 10
+    pool._take(bucket, 1)
+    assert bucket.rate == pytest.approx(6)
+    for _ in range(10):
+        pool._take(bucket, 0)
+    assert bucket.rate == 10
+
+    # other keys are not affected
+    assert pool.bucket("other").rate == 10
+
+
+def test_release_gives_back_tokens():
+    pool = RatePool(1, burst=5)
+
+    async def main():
+        rolled_back = await pool.allocate.try_allocate(2)
+        rolled_back.release()
+        rolled_back.release()
+        assert pool.available_size == 5
+
+        used = await pool.allocate(2)
+        await used.cleanup()
+        assert pool.available_size == 3
+
+    asyncio.run(main())
+
+
+def test_waiting_gang_keeps_tokens():
+    from ml_scheduler.exp.gang import GangScheduler
+
+    pool = RatePool(1, burst=5)
+    blocked = CounterPool(1, available=0)
+    scheduler = GangScheduler(interval=0.05)
+
+    async def main():
+        waiting = asyncio.create_task(
+            scheduler.acquire({
+                "tokens": (pool.allocate, (1, ), {}),
+                "slot": (blocked.allocate, (1, ), {}),
+            }))
+        await asyncio.sleep(0.5)
+        assert pool.available_size == 5
+        waiting.cancel()
+
+    asyncio.run(main())
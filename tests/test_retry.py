@@ -0,0 +1,151 @@
+import asyncio
+import subprocess
+import sys
+
+import pytest
+
+import ml_scheduler
+from ml_scheduler import Exp, RetryPolicy
+from ml_scheduler.exp.exp import STDERR_TAIL_LINES
+from ml_scheduler.pools import CounterPool
+
+
+def called_process_error(returncode=1, output="", stderr=None):
+    return subprocess.CalledProcessError(returncode, ["train"], output=output, stderr=stderr)
+
+
+def test_from_arg():
+    assert RetryPolicy.from_arg(None) is None
+    assert RetryPolicy.from_arg(4).max_attempts == 4
+    policy = RetryPolicy()
+    assert RetryPolicy.from_arg(policy) is policy
+
+
+def test_classify_exception_type():
+    policy = RetryPolicy(retry_on=(ConnectionError, ), give_up_on=(ConnectionRefusedError, ))
+    assert policy.classify(ConnectionResetError()) == "retry"
+    assert policy.classify(ConnectionRefusedError()) is None
+    assert policy.classify(ValueError()) is None
+
+
+def test_classify_returncode():
+    policy = RetryPolicy(retry_on_returncode={137})
+    assert policy.classify(called_process_error(137)) == "retry"
+    assert policy.classify(called_process_error(1)) is None
+    assert RetryPolicy().classify(called_process_error(1)) == "retry"
+
+
+def test_classify_output():
+    policy = RetryPolicy(retry_on_output=[r"NCCL timeout"])
+    assert policy.classify(called_process_error(output="... NCCL timeout ...")) == "retry"
+    assert policy.classify(called_process_error(output=b"NCCL timeout")) == "retry"
+    assert policy.classify(called_process_error(output="loss is nan")) is None
+    assert policy.classify(called_process_error(stderr="NCCL timeout")) == "retry"
+
+
+def test_classify_oom():
+    policy = RetryPolicy(retry_on=())
+    assert policy.classify(MemoryError()) == "oom"
+    assert policy.classify(RuntimeError("CUDA out of memory. Tried to allocate")) == "oom"
+    assert policy.classify(called_process_error(output="torch.OutOfMemoryError")) == "oom"
+    assert policy.classify(called_process_error(stderr=b"CUDA out of memory")) == "oom"
+    assert policy.classify(RuntimeError("shape mismatch")) is None
+    assert RetryPolicy(give_up_on=(MemoryError, )).classify(MemoryError()) is None
+
+
+def test_delay_bounds():
+    policy = RetryPolicy(backoff=1, backoff_factor=2, max_backoff=10, jitter=0.5)
+    for attempt, base in [(1, 1), (2, 2), (3, 4), (10, 10)]:
+        for _ in range(100):
+            assert base * 0.5 <= policy.delay(attempt) <= base * 1.5
+    assert RetryPolicy(jitter=0).delay(3) == 4
+
+
+def test_oom_escalation():
+    pool = CounterPool(8)
+    attempts = []
+
+    @ml_scheduler.exp_func(retry=RetryPolicy(
+        max_attempts=4,
+        backoff=0,
+        escalate=lambda row: {**row, "n": row["n"] * 2},
+    ))
+    async def train(exp, n):
+        # the slots of the failed attempts are given back
+        attempts.append((n, pool.free))
+        await exp.get(pool.allocate, n)
+        if n < 4:
+            raise RuntimeError("CUDA out of memory")
+        return n
+
+    exp, result = asyncio.run(train(Exp(None, "a"), n=1))
+    assert attempts == [(1, 8), (2, 8), (4, 8)]
+    assert result == 4
+    assert exp.attempt == 3
+    assert exp.error is None
+    assert pool.free == 8
+
+
+def test_oom_in_subprocess_stderr(capfd):
+    attempts = []
+    child = ("import sys; print('x' * 1000, file=sys.stderr); "
+             "print('torch.OutOfMemoryError: CUDA out of memory.', file=sys.stderr); "
+             "sys.exit(int(sys.argv[1]) < 2)")
+
+    @ml_scheduler.exp_func(retry=RetryPolicy(
+        max_attempts=3,
+        backoff=0,
+        retry_on_returncode=(),
+        escalate=lambda row: {**row, "n": row["n"] * 2},
+    ))
+    async def train(exp, n):
+        attempts.append(n)
+        return await exp.run([sys.executable, "-c", child, str(n)], env=None)
+
+    exp, _ = asyncio.run(train(Exp(None, "a"), n=1))
+    assert attempts == [1, 2]
+    assert exp.error is None
+    # stderr is still shown
+    lines = capfd.readouterr().err.splitlines()
+    assert lines.count("torch.OutOfMemoryError: CUDA out of memory.") == 2
+
+
+def test_stderr_tail():
+    child = "import sys; [print(i, file=sys.stderr) for i in range(1000)]; sys.exit(3)"
+
+    async def main():
+        await Exp(None, "a").run([sys.executable, "-c", child], env=None)
+
+    with pytest.raises(subprocess.CalledProcessError) as info:
+        asyncio.run(main())
+    assert info.value.returncode == 3
+    lines = info.value.stderr.splitlines()
+    assert len(lines) == STDERR_TAIL_LINES
+    assert lines[-1] == "999"
+
+
+def test_give_up_after_max_attempts():
+    attempts = []
+
+    @ml_scheduler.exp_func(retry=RetryPolicy(max_attempts=2, backoff=0))
+    async def train(exp):
+        attempts.append(exp.attempt)
+        raise ConnectionError("reset")
+
+    exp, result = asyncio.run(train(Exp(None, "a")))
+    assert attempts == [1, 2]
+    assert result == ""
+    assert isinstance(exp.error, ConnectionError)
+
+
+@pytest.mark.parametrize("retry", [None, 1])
+def test_no_retry(retry):
+    attempts = []
+
+    @ml_scheduler.exp_func(retry=retry)
+    async def train(exp):
+        attempts.append(exp.attempt)
+        raise ConnectionError("reset")
+
+    asyncio.run(train(Exp(None, "a")))
+    assert attempts == [1]
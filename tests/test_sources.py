@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pytest
+
+from ml_scheduler.pools import LocalSource, S3Source
+from ml_scheduler.pools.manifest import FileEntry, ManifestCache
+
+OBJECTS = {
+    "ckpt/m/config.json": b"{}",
+    "ckpt/m/shards/0.bin": bytes(range(256)) * 4,
+    "ckpt/m/shards/1.bin": b"1" * 300,
+    "ckpt/m/": b"",
+    "ckpt/m//tmp/escape.bin": b"x",
+    "ckpt/m/../escape.bin": b"x",
+    "ckpt/m/./dot.bin": b"x",
+    "ckpt/m-chat/config.json": b"{\"chat\": true}",
+    "other.bin": b"x",
+}
+
+
+class Bucket(BaseHTTPRequestHandler):
+    """A stand-in for the part of the S3 API used by `S3Source`: paged ListObjectsV2 and ranged
+    GETs of the bucket `models`."""
+
+    page_size = 2
+    # `key: times` to fail with a 500
+    failures = {}
+    # `key: etag` served instead of the MD5 of the object
+    etags = {}
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self.requests.append((unquote(url.path), self.headers.get("Range"),
+                              self.headers.get("Authorization")))
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        if bucket != "models":
+            return self.send_error(404)
+        if not key:
+            return self.list(parse_qs(url.query))
+        if self.failures.get(key):
+            self.failures[key] -= 1
+            return self.send_error(500)
+        if key not in OBJECTS:
+            return self.send_error(404)
+
+        data = OBJECTS[key]
+        status = 200
+        if self.headers.get("Range"):
+            start, _, end = self.headers["Range"].removeprefix("bytes=").partition("-")
+            data = data[int(start):int(end) + 1]
+            status = 206
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def list(self, query):
+        prefix = query.get("prefix", [""])[0]
+        start = int(query.get("continuation-token", ["0"])[0])
+        keys = sorted(key for key in OBJECTS if key.startswith(prefix))
+        page = keys[start:start + self.page_size]
+        truncated = start + self.page_size < len(keys)
+        contents = "".join(
+            f"<Contents><Key>{key}</Key><Size>{len(OBJECTS[key])}</Size>"
+            f"<LastModified>2024-01-01T00:00:00.000Z</LastModified>"
+            f"<ETag>&quot;{self.etags.get(key, hashlib.md5(OBJECTS[key]).hexdigest())}&quot;</ETag>"
+            f"</Contents>" for key in page)
+        body = ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+                f"<Prefix>{prefix}</Prefix>{contents}"
+                f"<IsTruncated>{'true' if truncated else 'false'}</IsTruncated>"
+                + (f"<NextContinuationToken>{start + self.page_size}</NextContinuationToken>"
+                   if truncated else "") + "</ListBucketResult>").encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def endpoint():
+    Bucket.failures, Bucket.etags, Bucket.requests = {}, {}, []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Bucket)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(source, target_dir, files=None):
+
+    async def main():
+        manifest = await source.manifest(ManifestCache())
+        return await source.fetch(manifest.select(files), target_dir)
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("prefix", ["ckpt/m", "ckpt/m/"])
+def test_list(endpoint, prefix):
+    source = S3Source(endpoint, "models", prefix, access_key="", secret_key="")
+    assert source.root == f"{endpoint}/models/ckpt/m/"
+    manifest = asyncio.run(source.manifest(ManifestCache()))
+    # siblings sharing the prefix are not listed, the folder marker is skipped
+    assert sorted(manifest.files) == ["config.json", "shards/0.bin", "shards/1.bin"]
+    assert manifest.files["shards/1.bin"].size == 300
+    assert manifest.files["config.json"].mtime_ns == 1704067200 * 10**9
+    # 7 keys under `ckpt/m/`, listed 2 by 2
+    assert [r for r in Bucket.requests if r[0] == "/models"] == [("/models", None, None)] * 4
+    assert source._key("config.json") == "ckpt/m/config.json"
+
+
+def test_whole_bucket(endpoint):
+    source = S3Source(endpoint, "models")
+    assert source.prefix == ""
+    manifest = asyncio.run(source.manifest(ManifestCache()))
+    assert "other.bin" in manifest.files
+    assert "ckpt/m-chat/config.json" in manifest.files
+
+
+def test_names_outside_target(endpoint, tmp_path):
+    source = S3Source(endpoint, "models", "ckpt/m")
+    target = tmp_path / "target"
+    with pytest.raises(ValueError):
+        asyncio.run(source.fetch({"../escape.bin": FileEntry(1, 0)}, target))
+    with pytest.raises(ValueError):
+        asyncio.run(source.fetch({str(tmp_path / "escape.bin"): FileEntry(1, 0)}, target))
+    assert not list(tmp_path.rglob("*escape*"))
+
+
+def test_ranged_fetch(endpoint, tmp_path):
+    source = S3Source(endpoint, "models", "ckpt/m", part_size=100, access_key="key",
+                      secret_key="secret")
+    assert fetch(source, tmp_path) == 2 + 1024 + 300
+    for key in ["config.json", "shards/0.bin", "shards/1.bin"]:
+        assert (tmp_path / key).read_bytes() == OBJECTS[f"ckpt/m/{key}"]
+    assert not list(tmp_path.rglob("*.part"))
+
+    ranges = sorted(r[1] for r in Bucket.requests if r[0] == "/models/ckpt/m/shards/1.bin")
+    assert ranges == ["bytes=0-99", "bytes=100-199", "bytes=200-299"]
+    # requests are signed
+    assert all(r[2].startswith("AWS4-HMAC-SHA256 Credential=key/") for r in Bucket.requests)
+
+
+def test_retry(endpoint, tmp_path):
+    Bucket.failures["ckpt/m/shards/1.bin"] = 1
+    source = S3Source(endpoint, "models", "ckpt/m", part_size=1000, retries=2)
+    fetch(source, tmp_path, ["shards/1.bin"])
+    assert (tmp_path / "shards" / "1.bin").read_bytes() == OBJECTS["ckpt/m/shards/1.bin"]
+
+    Bucket.failures["ckpt/m/config.json"] = 2
+    with pytest.raises(OSError):
+        fetch(source, tmp_path, ["config.json"])
+    assert not (tmp_path / "config.json.part").exists()
+
+
+def test_checksum_mismatch(endpoint, tmp_path):
+    Bucket.etags["ckpt/m/shards/0.bin"] = "0" * 32
+    # multipart ETags are not checked
+    Bucket.etags["ckpt/m/shards/1.bin"] = "0" * 32 + "-2"
+    source = S3Source(endpoint, "models", "ckpt/m")
+    with pytest.raises(OSError, match="Checksum mismatch"):
+        fetch(source, tmp_path, ["shards/0.bin"])
+    assert not list(tmp_path.rglob("0.bin*"))
+
+    fetch(source, tmp_path, ["shards/1.bin"])
+    assert (tmp_path / "shards" / "1.bin").exists()
+
+
+def test_local_copy_folder(tmp_path):
+    from ml_scheduler.pools import DiskPool
+
+    source = tmp_path / "source"
+    (source / "shards").mkdir(parents=True)
+    (source / "config.json").write_text("{}")
+    (source / "shards" / "0.bin").write_bytes(b"0" * 2_000_000)
+    target = tmp_path / "target"
+    pool = DiskPool(str(tmp_path), unit="MB")
+
+    async def main():
+        resource = await pool.copy_folder(LocalSource(str(source)), str(target))
+        assert resource.size() == 2
+        # counted by the disk usage once copied
+        assert pool.pre_allocated == 0
+        copied = sorted(p.relative_to(target).as_posix() for p in target.rglob("*.*"))
+        await resource.cleanup()
+        return copied
+
+    assert asyncio.run(main()) == ["config.json", "shards/0.bin"]
+    assert not target.exists()
+    assert pool.pre_allocated == 0
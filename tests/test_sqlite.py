@@ -0,0 +1,125 @@
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+import ml_scheduler
+from ml_scheduler.exp.runner.sqlite import SQLiteRunner
+
+INTERVAL = 0.2
+
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    path = str(tmp_path / "exps.sqlite")
+    with sqlite3.connect(path) as dbcon:
+        dbcon.execute('CREATE TABLE exps (x TEXT, loss REAL, ":uuid:" TEXT)')
+        dbcon.executemany("INSERT INTO exps (x) VALUES (?)", [("a", ), ("b", )])
+    return path
+
+
+def execute(sqlite_path, sql, params=()):
+    dbcon = sqlite3.connect(sqlite_path)
+    with dbcon:
+        dbcon.execute(sql, params)
+    dbcon.close()
+
+
+def watch(sqlite_path, test, slow=None):
+    runs = {}
+
+    @ml_scheduler.exp_func
+    async def train(exp, x):
+        runs[x] = runs.get(x, 0) + 1
+        if x == slow:
+            await asyncio.sleep(60)
+        await exp.report(loss=len(x))
+
+    async def main():
+        task = asyncio.create_task(
+            train.arun_sqlite(sqlite_path,
+                              "exps", ["loss"],
+                              retval_column=None,
+                              watch=True,
+                              watch_interval=INTERVAL))
+        try:
+            await test(runs)
+        finally:
+            task.cancel()
+
+    asyncio.run(main())
+
+
+async def until(predicate, timeout=INTERVAL * 10):
+    for _ in range(int(timeout / 0.05)):
+        if predicate():
+            return True
+        await asyncio.sleep(0.05)
+    return False
+
+
+def test_new_rows_above_high_water_mark(sqlite_path):
+
+    async def test(runs):
+        assert await until(lambda: runs == {"a": 1, "b": 1})
+        execute(sqlite_path, "INSERT INTO exps (x) VALUES ('cc')")
+        execute(sqlite_path, """INSERT INTO exps (x, ":uuid:") VALUES ('ddd', 'given-uuid')""")
+        assert await until(lambda: "cc" in runs and "ddd" in runs)
+        await asyncio.sleep(INTERVAL * 2)
+        assert runs == {"a": 1, "b": 1, "cc": 1, "ddd": 1}
+
+        dbcon = sqlite3.connect(sqlite_path)
+        rows = dbcon.execute('SELECT x, loss, ":uuid:" FROM exps ORDER BY rowid').fetchall()
+        dbcon.close()
+        assert [float(row[1]) for row in rows] == [1, 1, 2, 3]
+        assert rows[-1][2] == "given-uuid"
+        assert all(row[2] is not None for row in rows)
+
+    watch(sqlite_path, test)
+
+
+def test_renull(sqlite_path):
+
+    async def test(runs):
+        assert await until(lambda: runs == {"a": 1, "b": 1})
+        await asyncio.sleep(INTERVAL * 2)
+        execute(sqlite_path, "UPDATE exps SET loss = NULL WHERE x = 'a'")
+        assert await until(lambda: runs["a"] == 2)
+        # not re-admitted again once filled
+        await asyncio.sleep(INTERVAL * 3)
+        assert runs == {"a": 2, "b": 1}
+
+    watch(sqlite_path, test)
+
+
+def test_reads_changes_off_loop(sqlite_path, monkeypatch):
+    execute(sqlite_path, "INSERT INTO exps (x) VALUES ('slow')")
+    fetched = []
+    fetch = SQLiteRunner._fetch
+
+    def spy(self, dbcon, where, params=()):
+        df = fetch(self, dbcon, where, params)
+        fetched.append((threading.current_thread() is threading.main_thread(), list(df["x"])))
+        return df
+
+    monkeypatch.setattr(SQLiteRunner, "_fetch", spy)
+
+    async def test(runs):
+        assert await until(lambda: runs == {"a": 1, "b": 1, "slow": 1})
+        execute(sqlite_path, "INSERT INTO exps (x) VALUES ('cc')")
+        assert await until(lambda: "cc" in runs)
+        execute(sqlite_path, "UPDATE exps SET loss = NULL WHERE x = 'a'")
+        assert await until(lambda: runs["a"] == 2)
+
+    watch(sqlite_path, test, slow="slow")
+    assert fetched
+    assert not any(on_loop for on_loop, _ in fetched)
+    # the pending row is never read again, only the inserted and updated ones
+    assert not any("slow" in rows for _, rows in fetched)
+    assert {"cc", "a"} <= {x for _, rows in fetched for x in rows}
+
+    dbcon = sqlite3.connect(sqlite_path)
+    objects = dbcon.execute("SELECT name FROM sqlite_master WHERE name LIKE '_ml_scheduler%'")
+    assert objects.fetchall() == []
+    dbcon.close()
@@ -0,0 +1,108 @@
+import asyncio
+import contextvars
+import threading
+import time
+
+import pytest
+
+import ml_scheduler
+import ml_scheduler.exp.runner.http
+from ml_scheduler import threads
+from ml_scheduler.threads import (StallDetector, get_executor, run_in_executor, set_executor_sizes,
+                                  shutdown_executors, to_thread)
+
+var = contextvars.ContextVar("var", default=None)
+
+
+@pytest.fixture(autouse=True)
+def fresh_executors():
+    shutdown_executors()
+    yield
+    shutdown_executors()
+    threads._explicit_sizes.clear()
+
+
+def test_executors_by_workload():
+
+    async def main():
+        return (await run_in_executor("copy", threading.current_thread),
+                await to_thread(threading.current_thread))
+
+    copy, user = asyncio.run(main())
+    assert copy.name.startswith("ml_scheduler-copy")
+    assert user.name.startswith("ml_scheduler-user")
+    assert get_executor("table")._max_workers == threads.EXECUTOR_SIZES["table"]
+    with pytest.raises(ValueError):
+        get_executor("gpu")
+    with pytest.raises(ValueError):
+        set_executor_sizes(gpu=1)
+
+
+def test_context_is_propagated():
+
+    async def main():
+        var.set("experiment")
+        return await run_in_executor("metadata", var.get)
+
+    assert asyncio.run(main()) == "experiment"
+
+
+def test_sizes(monkeypatch):
+    monkeypatch.setenv("ML_SCHEDULER_COPY_THREADS", "3")
+    monkeypatch.setenv("ML_SCHEDULER_TABLE_THREADS", "5")
+    set_executor_sizes(copy=6)
+    assert get_executor("copy")._max_workers == 6
+    assert get_executor("table")._max_workers == 5
+
+    # started executors keep their size until shut down
+    set_executor_sizes(copy=1)
+    assert get_executor("copy")._max_workers == 6
+    shutdown_executors()
+    assert get_executor("copy")._max_workers == 1
+
+
+def test_stall_detector():
+
+    async def main():
+        detector = StallDetector(0.2).start()
+        await asyncio.sleep(0.3)
+        assert detector.stalls == 0
+        time.sleep(0.6)
+        await asyncio.sleep(0.3)
+        detector.stop()
+        await asyncio.sleep(0.1)
+        return detector
+
+    detector = asyncio.run(main())
+    # reported once per stall
+    assert detector.stalls == 1
+    assert not detector._running
+    time.sleep(0.2)
+    assert not any(t.name == "ml_scheduler-stall-detector" for t in threading.enumerate())
+
+
+def test_runner_stops_detector(monkeypatch):
+    monkeypatch.setenv("ML_SCHEDULER_STALL_THRESHOLD", "0.2")
+    detectors = []
+
+    def detect_stalls():
+        detectors.append(threads.detect_stalls())
+        return detectors[-1]
+
+    monkeypatch.setattr(ml_scheduler.exp.runner.http, "detect_stalls", detect_stalls)
+
+    @ml_scheduler.exp_func
+    async def train(exp):
+        pass
+
+    async def main():
+        runner = train._http_runner
+        server = asyncio.create_task(runner.arun(port=0))
+        while not hasattr(runner, "port"):
+            await asyncio.sleep(0.01)
+        assert detectors[0]._running
+        server.cancel()
+        await asyncio.gather(server, return_exceptions=True)
+        assert not detectors[0]._running
+
+    asyncio.run(main())